@@ -1,7 +1,10 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
+from app.session import RoutingSession
+
+# GET requests read through the "reader" bind when one is configured
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 
 def create_app():
@@ -11,7 +14,23 @@ def create_app():
 
     db.init_app(app)
 
+    # Cache of GET responses, invalidated by the API's writes
+    from app.response_cache import init_response_cache
+
+    init_response_cache(app)
+
+    # Name -> id lookup of the dimension tables, used when writing records
+    from app.dimension_cache import init_dimension_cache
+
+    init_dimension_cache(app)
+
     with app.app_context():
+        # SQLite connection settings (WAL journal, busy timeout, ...) of the
+        # writer and reader engines
+        from app.database import init_sqlite_pragmas
+
+        init_sqlite_pragmas(app)
+
         # Import parts of our application
         from app.urls import api_blueprint
 
@@ -20,4 +39,9 @@ def create_app():
         # Import our models for SQLAlchemy
         from app import models
 
+        # Load the trained imputation model once, for the /api/predict endpoint
+        from app.model_store import load_latest_artifact
+
+        app.extensions["imputation_model"] = load_latest_artifact()
+
     return app
@@ -0,0 +1,98 @@
+from marshmallow import ValidationError
+
+from . import db
+from app.dimension_cache import RECORD_DIMENSIONS, dimension_cache
+from app.models import NATURAL_KEY
+from app.queries import records_with_keys
+
+# Largest number of records accepted by one batch request
+MAX_BATCH_SIZE = 10000
+
+
+class BatchError(ValueError):
+    """Raised for a batch request body that is not a usable list of items."""
+
+
+def batch_items(items, name="records"):
+    # Check the body of a batch request is a list of at most MAX_BATCH_SIZE items
+    if not isinstance(items, list) or not items:
+        raise BatchError(f"Expected a non-empty JSON list of {name}")
+    if len(items) > MAX_BATCH_SIZE:
+        raise BatchError(f"A batch holds at most {MAX_BATCH_SIZE} {name}")
+    return items
+
+
+def is_record_id(value):
+    # JSON integer usable as a record id (bool is a subclass of int in Python)
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def load_items(schema, items, errors, **kwargs):
+    """Validate ``items`` (a dict of index -> item) with ``schema``.
+
+    Returns the loaded data of the valid items by index; the messages of the
+    invalid ones are added to ``errors`` under their index.
+    """
+    loaded = {}
+    for index, item in items.items():
+        try:
+            loaded[index] = schema.load(item, **kwargs)
+        except ValidationError as e:
+            errors[index] = e.messages
+    return loaded
+
+
+def add_error(errors, index, field, message):
+    errors.setdefault(index, {}).setdefault(field, []).append(message)
+
+
+def resolve_dimensions(loaded, errors):
+    """Replace the dimension names of the loaded items by foreign key ids.
+
+    Names are resolved through the dimension cache, which runs at most one
+    ``IN`` query per dimension table for the names it has not cached yet.
+    Items naming an unknown value are reported in ``errors`` and left out of
+    the returned items.
+    """
+    for field, (_, foreign_key, label) in RECORD_DIMENSIONS.items():
+        names = {data[field] for data in loaded.values() if field in data}
+        if not names:
+            continue
+        ids = dimension_cache().ids(field, names)
+        for index, data in loaded.items():
+            if field not in data:
+                continue
+            name = data.pop(field)
+            if name in ids:
+                data[foreign_key] = ids[name]
+            else:
+                add_error(errors, index, field, f"{label} {name} not found!")
+    return {index: data for index, data in loaded.items() if index not in errors}
+
+
+def natural_key(values):
+    return tuple(values[column] for column in NATURAL_KEY)
+
+
+def existing_keys(keys, exclude_ids=()):
+    # Natural keys among ``keys`` already used by records not in ``exclude_ids``
+    return {
+        natural_key(record)
+        for record in records_with_keys(db.session, keys, exclude_ids)
+    }
+
+
+def flag_duplicates(keyed, errors, exclude_ids=()):
+    """Report items (a dict of index -> natural key) that would be duplicates.
+
+    An item is a duplicate if a record outside ``exclude_ids`` already has
+    its natural key, or if an earlier item of the batch has it.
+    """
+    if not keyed:
+        return
+    taken = existing_keys(set(keyed.values()), exclude_ids)
+    seen = set()
+    for index, key in keyed.items():
+        if key in taken or key in seen:
+            add_error(errors, index, "_schema", "Duplicate record")
+        seen.add(key)
@@ -0,0 +1,53 @@
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+
+from . import db
+from app.session import READER_BIND
+
+
+# Settings that only apply to (and can only be changed by) the writer
+WRITER_PRAGMAS = ("journal_mode", "synchronous")
+
+
+def init_sqlite_pragmas(app):
+    """Apply the SQLITE_* settings of the config to every new connection.
+
+    The read-only ``reader`` engine gets the busy timeout and mmap size; the
+    journal mode is a property of the database file, set by the writer. Does
+    nothing for other database backends.
+    """
+    pragmas = {
+        "journal_mode": app.config["SQLITE_JOURNAL_MODE"],
+        "synchronous": app.config["SQLITE_SYNCHRONOUS"],
+        "busy_timeout": app.config["SQLITE_BUSY_TIMEOUT_MS"],
+        "mmap_size": app.config["SQLITE_MMAP_SIZE"],
+    }
+    for bind_key, engine in db.engines.items():
+        if engine.dialect.name != "sqlite":
+            continue
+        if bind_key == READER_BIND:
+            _listen_pragmas(
+                engine,
+                {k: v for k, v in pragmas.items() if k not in WRITER_PRAGMAS},
+            )
+        else:
+            _listen_pragmas(engine, pragmas)
+            # Switch the file to WAL before a reader opens it
+            with engine.connect():
+                pass
+
+
+def _listen_pragmas(engine, pragmas):
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def dialect_insert(session, table):
+    # INSERT construct supporting ON CONFLICT for the session's database
+    if session.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
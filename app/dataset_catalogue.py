@@ -0,0 +1,62 @@
+# dataset_catalogue.py
+"""Declarative catalogue of the Eurostat tables ingested into the star schema.
+
+Adding a table to the pipeline means adding an entry here. Entry keys:
+
+- code, id_vars, value_name: the dataset and how it is melted.
+- total_columns: columns whose rows are kept only for their TOTAL codes.
+- filters: column -> list of codes to keep.
+- year_range: (first, last) year kept, defaults to the pipeline's YEAR_RANGE.
+- dimensions: star schema column -> (dataset column, dictionary or None).
+- unit: optional {"target": unit, "conversions": {unit: factor}}. Values in
+  a convertible unit are converted to the target unit; rows already in the
+  target unit win over converted ones.
+- impute: predict missing values with the household imputation model
+  instead of dropping them (household energy table only).
+- timeout, retries: optional download settings.
+"""
+from notebooks.eurostat_dictionary import country_dictionary, energy_types_dict
+
+# Dimension columns shared by the Eurostat energy tables
+ENERGY_DIMENSIONS = {
+    "countries": ("geo\\TIME_PERIOD", country_dictionary),
+    "energy_types": ("siec", None),
+    "energy_use_types": ("nrg_bal", energy_types_dict),
+    "units": ("unit", None),
+}
+ENERGY_ID_VARS = ["freq", "nrg_bal", "siec", "unit", "geo\\TIME_PERIOD"]
+
+# Disaggregated final energy consumption in households, by use type
+HOUSEHOLD_ENERGY = {
+    "code": "nrg_d_hhq",
+    "id_vars": ENERGY_ID_VARS,
+    "value_name": "energy_consumption",
+    "total_columns": ["siec"],
+    "filters": {"nrg_bal": list(energy_types_dict)},
+    "dimensions": ENERGY_DIMENSIONS,
+    "impute": True,
+}
+
+# Number of households, the feature dataset of the imputation model. It is
+# merged with HOUSEHOLD_ENERGY and not loaded into the star schema itself.
+HOUSEHOLDS = {
+    "code": "lfst_hhnhtych",
+    "id_vars": ["freq", "agechild", "n_child", "hhcomp", "unit", "geo\\TIME_PERIOD"],
+    "value_name": "number_of_households",
+    "total_columns": ["agechild", "n_child", "hhcomp"],
+}
+
+CATALOGUE = [
+    HOUSEHOLD_ENERGY,
+    # Final energy consumption of industry, transport and commercial and
+    # public services, from the complete energy balances
+    {
+        "code": "nrg_bal_c",
+        "id_vars": ENERGY_ID_VARS,
+        "value_name": "energy_consumption",
+        "total_columns": ["siec"],
+        "filters": {"nrg_bal": ["FC_IND_E", "FC_TRA_E", "FC_OTH_CP_E"]},
+        "dimensions": ENERGY_DIMENSIONS,
+        "unit": {"target": "TJ", "conversions": {"KTOE": 41.868, "GWH": 3.6}},
+    },
+]
@@ -0,0 +1,101 @@
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import select
+
+from . import db
+from app.models import Countries, EnergyType, EnergyUseType, Units
+from app.response_cache import invalidate_responses, read_generation
+
+# Record fields naming a dimension: the dimension's name column, the foreign
+# key it resolves to and how a missing value is reported
+RECORD_DIMENSIONS = {
+    "countries": (Countries.name, "countries_id", "Country name"),
+    "energy_types": (EnergyType.code, "energy_types_id", "Energy type code"),
+    "energy_use_types": (
+        EnergyUseType.type,
+        "energy_use_types_id",
+        "Energy use type",
+    ),
+    "units": (Units.name, "units_id", "Unit name"),
+}
+
+
+class DimensionCache:
+    """In-memory name -> id maps of the four (small) dimension tables.
+
+    A table is read in full the first time one of its names is looked up and
+    again once its map is older than ``ttl`` seconds. Names missing from a
+    map are looked up in the table before being reported as unknown, so rows
+    added by another process (e.g. populate_db.py) are picked up on demand.
+    Every map is dropped when another process signals a write through the
+    response cache's generation file (see ``invalidate_dimensions``), so ids
+    of rewritten dimension tables are never reused.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._maps = {}
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def _map(self, field):
+        with self._lock:
+            generation = read_generation()
+            if generation != self._generation:
+                self._maps.clear()
+                self._generation = generation
+            loaded = self._maps.get(field)
+            if loaded is None or loaded[0] + self.ttl < time.monotonic():
+                column = RECORD_DIMENSIONS[field][0]
+                rows = db.session.execute(select(column, column.class_.id)).all()
+                loaded = (time.monotonic(), dict(rows))
+                self._maps[field] = loaded
+            return loaded[1]
+
+    def ids(self, field, names):
+        """Map the ``names`` of dimension ``field`` that exist to their ids.
+
+        Names not cached yet are looked up with one ``IN`` query.
+        """
+        names = set(names)
+        ids = self._map(field)
+        with self._lock:
+            missing = names - ids.keys()
+        if missing:
+            column = RECORD_DIMENSIONS[field][0]
+            rows = db.session.execute(
+                select(column, column.class_.id).where(column.in_(missing))
+            ).all()
+            with self._lock:
+                ids.update(rows)
+        with self._lock:
+            return {name: ids[name] for name in names if name in ids}
+
+    def id(self, field, name):
+        # Id of one dimension value, or None if it does not exist
+        return self.ids(field, [name]).get(name)
+
+    def clear(self):
+        with self._lock:
+            self._maps.clear()
+
+
+def init_dimension_cache(app):
+    app.extensions["dimension_cache"] = DimensionCache(
+        app.config.get("DIMENSION_CACHE_TTL", 300)
+    )
+
+
+def dimension_cache():
+    # Dimension cache of the current app
+    return current_app.extensions["dimension_cache"]
+
+
+def invalidate_dimensions():
+    # Drop the dimension maps of every API process, and the cached responses,
+    # after the dimension tables (or the records) were rewritten outside the
+    # API, e.g. by init-db or populate_db.py
+    dimension_cache().clear()
+    invalidate_responses()
@@ -0,0 +1,187 @@
+# eurostat_cache.py
+"""On-disk cache of Eurostat datasets.
+
+Each dataset is stored as a Parquet file named after its code, next to a JSON
+sidecar with when it was fetched and the Eurostat "last update of data" it
+corresponds to. A cached copy is reused until it is older than the TTL, and
+is then only downloaded again if Eurostat has updated the dataset since.
+"""
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import eurostat
+import pandas as pd
+import requests
+
+CACHE_DIR = Path(
+    os.environ.get(
+        "EUROSTAT_CACHE_DIR",
+        Path(__file__).resolve().parent.parent / "instance" / "eurostat_cache",
+    )
+)
+CACHE_TTL = timedelta(hours=float(os.environ.get("EUROSTAT_CACHE_TTL_HOURS", 24)))
+
+# Run entirely from the cache, never contacting Eurostat
+OFFLINE = os.environ.get("EUROSTAT_OFFLINE", "").lower() in ("1", "true", "yes")
+
+# Socket timeout of the download requests, number of attempts, and the delay
+# before the first retry (doubled for every further retry), in seconds
+DOWNLOAD_TIMEOUT = float(os.environ.get("EUROSTAT_DOWNLOAD_TIMEOUT", 600))
+DOWNLOAD_RETRIES = int(os.environ.get("EUROSTAT_DOWNLOAD_RETRIES", 3))
+RETRY_BACKOFF = 2.0
+
+# Timeouts of the downloads in progress, and the eurostat package's own
+# timeout to restore when none is left
+_TIMEOUTS = Counter()
+_TIMEOUTS_LOCK = threading.Lock()
+_PACKAGE_TIMEOUT = None
+
+
+def cache_paths(code, cache_dir=CACHE_DIR):
+    cache_dir = Path(cache_dir)
+    return cache_dir / f"{code}.parquet", cache_dir / f"{code}.json"
+
+
+def read_metadata(code, cache_dir=CACHE_DIR):
+    data_path, metadata_path = cache_paths(code, cache_dir)
+    if not data_path.exists() or not metadata_path.exists():
+        return None
+    return json.loads(metadata_path.read_text())
+
+
+def write_metadata(code, metadata, cache_dir=CACHE_DIR):
+    _, metadata_path = cache_paths(code, cache_dir)
+    metadata_path.write_text(json.dumps(metadata, indent=2))
+
+
+def remote_version(code):
+    # Eurostat's "last update of data" for the dataset, or None if unavailable
+    try:
+        toc = eurostat.get_toc_df(agency="EUROSTAT", dataset=code)
+        return str(toc["last update of data"].iloc[0])
+    except Exception:
+        return None
+
+
+def retryable(error):
+    # Network errors and timeouts are retried, server errors (5xx) too. Other
+    # errors, like an unknown dataset code or a client error, fail at once.
+    if isinstance(error, requests.HTTPError):
+        response = error.response
+        return response is None or response.status_code >= 500
+    return isinstance(error, (requests.RequestException, ConnectionError, TimeoutError))
+
+
+@contextmanager
+def request_timeout(timeout):
+    # The eurostat package reads the timeout of its HTTP requests from a
+    # module setting shared by every thread. While downloads run concurrently
+    # it is the longest of their timeouts, so no download is cut short.
+    global _PACKAGE_TIMEOUT
+    with _TIMEOUTS_LOCK:
+        if not _TIMEOUTS:
+            _PACKAGE_TIMEOUT = eurostat.get_requests_args().get("timeout")
+        _TIMEOUTS[timeout] += 1
+        eurostat.set_requests_args(timeout=max(_TIMEOUTS))
+    try:
+        yield
+    finally:
+        with _TIMEOUTS_LOCK:
+            _TIMEOUTS[timeout] -= 1
+            if not _TIMEOUTS[timeout]:
+                del _TIMEOUTS[timeout]
+            eurostat.set_requests_args(
+                timeout=max(_TIMEOUTS) if _TIMEOUTS else _PACKAGE_TIMEOUT
+            )
+
+
+def download(
+    code, timeout=DOWNLOAD_TIMEOUT, retries=DOWNLOAD_RETRIES, backoff=RETRY_BACKOFF
+):
+    """Download the Eurostat dataset ``code``, retrying network failures.
+
+    ``timeout`` is the socket timeout of the HTTP requests: an attempt fails
+    when Eurostat doesn't respond, or stops sending data, for that long.
+    Network errors, timeouts and server errors are retried with exponential
+    backoff, other errors are raised at once.
+    """
+    with request_timeout(timeout):
+        for attempt in range(1, retries + 1):
+            try:
+                return eurostat.get_data_df(code)
+            except Exception as e:
+                if attempt == retries or not retryable(e):
+                    raise
+                delay = backoff * 2 ** (attempt - 1)
+                print(
+                    f"Download of {code} failed ({e!r}), "
+                    f"retrying in {delay:g}s (attempt {attempt + 1}/{retries})"
+                )
+                time.sleep(delay)
+
+
+def get_data_df(
+    code,
+    ttl=CACHE_TTL,
+    force_refresh=False,
+    offline=OFFLINE,
+    cache_dir=CACHE_DIR,
+    timeout=DOWNLOAD_TIMEOUT,
+    retries=DOWNLOAD_RETRIES,
+):
+    """Return the Eurostat dataset ``code`` as a DataFrame, using the cache.
+
+    - ``offline``: only read the cache, raising if the dataset is not cached.
+    - ``force_refresh``: download the dataset even if a fresh copy is cached.
+    - Otherwise a cached copy younger than ``ttl`` is returned as is. An older
+      copy is revalidated against the dataset's last update date on Eurostat
+      and only downloaded again if it changed.
+
+    ``timeout`` and ``retries`` apply to the download, see ``download``.
+    """
+    data_path, _ = cache_paths(code, cache_dir)
+    metadata = read_metadata(code, cache_dir)
+    now = datetime.now(timezone.utc)
+
+    if offline:
+        if metadata is None:
+            raise FileNotFoundError(
+                f"Eurostat dataset {code} is not cached in {cache_dir}, "
+                "run once without offline mode to download it"
+            )
+        return pd.read_parquet(data_path)
+
+    version = None
+    if metadata is not None and not force_refresh:
+        fetched_at = datetime.fromisoformat(metadata["fetched_at"])
+        if now - fetched_at < ttl:
+            return pd.read_parquet(data_path)
+
+        # Conditional refresh: keep the cached copy if Eurostat has no newer data
+        version = remote_version(code)
+        if version is not None and version == metadata.get("version"):
+            metadata["fetched_at"] = now.isoformat()
+            write_metadata(code, metadata, cache_dir)
+            return pd.read_parquet(data_path)
+
+    df = download(code, timeout=timeout, retries=retries)
+
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    df.to_parquet(data_path, index=False)
+    write_metadata(
+        code,
+        {
+            "code": code,
+            "fetched_at": now.isoformat(),
+            "version": version if version is not None else remote_version(code),
+            "rows": len(df),
+        },
+        cache_dir,
+    )
+    return df
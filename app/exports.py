@@ -0,0 +1,182 @@
+import io
+import json
+
+import numpy as np
+from flask import Response, stream_with_context
+from sqlalchemy import select
+
+from . import db
+from app.models import EnergyRecord, Countries, EnergyType, EnergyUseType, Units
+from app.queries import row_to_dict
+
+# pyarrow is only needed for the columnar export formats
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+PYARROW_AVAILABLE = pa is not None
+
+# Rows fetched from the cursor per round trip while streaming an export
+EXPORT_BATCH_SIZE = 1000
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MIMETYPE = "application/vnd.apache.parquet"
+EXPORT_FORMATS = {
+    "json": "application/json",
+    "ndjson": NDJSON_MIMETYPE,
+    "arrow": ARROW_MIMETYPE,
+    "parquet": PARQUET_MIMETYPE,
+}
+COLUMNAR_FORMATS = ("arrow", "parquet")
+
+# Dimension columns of the columnar exports: the foreign key read from
+# energy_records and the dimension table providing the dictionary values.
+DICTIONARY_COLUMNS = {
+    "countries": (EnergyRecord.countries_id, Countries, Countries.name),
+    "energy_types": (EnergyRecord.energy_types_id, EnergyType, EnergyType.code),
+    "energy_use_types": (
+        EnergyRecord.energy_use_types_id,
+        EnergyUseType,
+        EnergyUseType.type,
+    ),
+    "units": (EnergyRecord.units_id, Units, Units.name),
+}
+
+
+def requested_format(request):
+    """Pick the response format from ``?format=`` or the Accept header.
+
+    Returns ``None`` when an unsupported format is asked for explicitly.
+    """
+    if "format" in request.args:
+        fmt = request.args["format"]
+        return fmt if fmt in EXPORT_FORMATS else None
+
+    # Browsers send */*, which best_match resolves to the first entry (JSON)
+    mimetype = request.accept_mimetypes.best_match(list(EXPORT_FORMATS.values()))
+    for fmt, export_mimetype in EXPORT_FORMATS.items():
+        if mimetype == export_mimetype:
+            return fmt
+    return "json"
+
+
+def ndjson_response(stmt):
+    """Stream ``stmt`` as newline-delimited JSON, one record per line.
+
+    Rows are pulled from the database in batches of ``EXPORT_BATCH_SIZE`` and
+    written as they arrive, so memory use does not depend on the table size.
+    """
+
+    def generate():
+        result = db.session.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for partition in result.partitions():
+            yield "".join(json.dumps(row_to_dict(row)) + "\n" for row in partition)
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+
+class _ChunkSink:
+    """Minimal writable file collecting the bytes pyarrow writes to it."""
+
+    closed = False
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def arrow_schema():
+    string_dictionary = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema(
+        [
+            ("id", pa.int64()),
+            ("countries", string_dictionary),
+            ("energy_types", string_dictionary),
+            ("energy_use_types", string_dictionary),
+            ("units", string_dictionary),
+            ("year", pa.int64()),
+            ("energy_consumption", pa.float64()),
+        ]
+    )
+
+
+def _dimension_dictionary(model, column):
+    # Lookup array from dimension id to position in the dictionary values
+    rows = db.session.execute(select(model.id, column).order_by(model.id)).all()
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    lookup = np.full(int(ids.max(initial=0)) + 1, -1, dtype=np.int32)
+    lookup[ids] = np.arange(len(ids), dtype=np.int32)
+    return lookup, pa.array([row[1] for row in rows], type=pa.string())
+
+
+def arrow_record_batches():
+    """Yield Arrow record batches of all energy records, ordered by id.
+
+    The fact table is read without joins: each foreign key column is turned
+    into dictionary indices against the values of its (small) dimension
+    table, so every batch shares the same four dictionaries.
+    """
+    schema = arrow_schema()
+    dictionaries = {
+        name: _dimension_dictionary(model, column)
+        for name, (_, model, column) in DICTIONARY_COLUMNS.items()
+    }
+    stmt = select(
+        EnergyRecord.id,
+        *(foreign_key for foreign_key, _, _ in DICTIONARY_COLUMNS.values()),
+        EnergyRecord.year,
+        EnergyRecord.energy_consumption,
+    ).order_by(EnergyRecord.id)
+
+    result = db.session.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    for partition in result.partitions():
+        columns = list(zip(*partition))
+        arrays = [pa.array(np.array(columns[0], dtype=np.int64))]
+        for position, name in enumerate(DICTIONARY_COLUMNS, start=1):
+            lookup, values = dictionaries[name]
+            indices = lookup[np.array(columns[position], dtype=np.int64)]
+            arrays.append(pa.DictionaryArray.from_arrays(indices, values))
+        arrays.append(pa.array(np.array(columns[-2], dtype=np.int64)))
+        arrays.append(pa.array(np.array(columns[-1], dtype=np.float64)))
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def arrow_response():
+    """Stream all energy records in the Arrow IPC streaming format."""
+
+    def generate():
+        sink = _ChunkSink()
+        with pa.ipc.new_stream(sink, arrow_schema()) as writer:
+            for batch in arrow_record_batches():
+                writer.write_batch(batch)
+                yield sink.drain()
+        yield sink.drain()
+
+    return Response(stream_with_context(generate()), mimetype=ARROW_MIMETYPE)
+
+
+def parquet_response():
+    """Return all energy records as a Parquet file.
+
+    Parquet writes its footer last, so the file is assembled in memory from
+    the same record batches as the Arrow stream before being sent.
+    """
+    buffer = io.BytesIO()
+    with pq.ParquetWriter(buffer, arrow_schema()) as writer:
+        for batch in arrow_record_batches():
+            writer.write_batch(batch)
+    return Response(buffer.getvalue(), mimetype=PARQUET_MIMETYPE)
@@ -0,0 +1,70 @@
+# imputation_model.py
+"""Preprocessing and inference of the energy consumption imputation model.
+
+Shared by the pipeline in process_energy_data.py and the /api/predict
+endpoint, so it only imports third-party packages.
+"""
+from sklearn.preprocessing import LabelEncoder
+from sklearn.preprocessing import PowerTransformer
+
+# Features of the energy consumption imputation model
+FEATURES = ["country", "number_of_households", "year", "energy_use_types"]
+NUMERICAL_FEATURES = ["country", "number_of_households", "energy_use_types"]
+
+
+def fit_preprocessors(df, train_df):
+    """Fit the target scaler, label encoders and feature scaler.
+
+    The label encoders learn the categories of every row (their vocabulary,
+    not the target), so rows to predict are encoded consistently with the
+    training rows.
+    """
+    preprocessors = {
+        "target_scaler": PowerTransformer().fit(train_df[["energy_consumption"]]),
+        "country_encoder": LabelEncoder().fit(df["country"]),
+        "use_type_encoder": LabelEncoder().fit(df["energy_use_types"]),
+    }
+
+    # Scale numerical features using PowerTransformer fitted on training data
+    encoded = encode_categories(train_df, preprocessors)
+    preprocessors["feature_scaler"] = PowerTransformer().fit(
+        encoded[NUMERICAL_FEATURES]
+    )
+    return preprocessors
+
+
+def encode_categories(df, preprocessors):
+    # Convert categorical features to numeric using the fitted LabelEncoders
+    df = df.copy()
+    df["country"] = preprocessors["country_encoder"].transform(df["country"])
+    df["energy_use_types"] = preprocessors["use_type_encoder"].transform(
+        df["energy_use_types"]
+    )
+    df["year"] = df["year"].astype("category")
+    return df
+
+
+def transform_features(df, preprocessors):
+    # Encode and scale the model features with fitted preprocessors
+    df = encode_categories(df, preprocessors)
+    df[NUMERICAL_FEATURES] = preprocessors["feature_scaler"].transform(
+        df[NUMERICAL_FEATURES]
+    )
+    return df
+
+
+def predict_consumption(artifact, features_df):
+    """Predict energy consumption for a batch of feature rows.
+
+    ``features_df`` holds the ``FEATURES`` columns with raw (unencoded)
+    values; the artifact's preprocessors and model are applied to the whole
+    batch at once and predictions are returned on the original scale.
+    """
+    preprocessors = artifact["preprocessors"]
+    X = transform_features(features_df[FEATURES], preprocessors)
+    predictions_scaled = artifact["model"].predict(X)
+    return (
+        preprocessors["target_scaler"]
+        .inverse_transform(predictions_scaled.reshape(-1, 1))
+        .ravel()
+    )
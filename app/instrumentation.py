@@ -0,0 +1,197 @@
+# instrumentation.py
+"""Per-stage instrumentation of the ETL pipeline.
+
+stage() and the instrumented decorator record, for each stage, its wall
+time, CPU time, rows going in and out and, in runs tracing memory, its peak
+traced memory.
+write_report() dumps the records of a run to a JSON run report.
+
+Stages may be nested, and may run concurrently in threads (the downloads) or
+worker processes (the catalogue entries, whose records the parent collects).
+Every record notes when the stage started relative to the run. CPU time and
+memory are measured for the whole process, so for concurrent stages they
+include the work of the other threads.
+"""
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+REPORT_DIR = Path(
+    os.environ.get(
+        "PIPELINE_REPORT_DIR",
+        Path(__file__).resolve().parent.parent / "instance" / "run_reports",
+    )
+)
+
+# Stage records of the current run, when the run started, and per thread
+# the names of the stages in progress
+STAGES = []
+_RUN = {"started": time.time(), "trace_memory": False}
+_LOCAL = threading.local()
+
+# Memory of the stages in progress in all threads (allocated when the stage
+# started and peak so far, in bytes), by id of the stage record
+_MEMORY = {}
+_MEMORY_LOCK = threading.Lock()
+
+
+def active_stages():
+    if not hasattr(_LOCAL, "active"):
+        _LOCAL.active = []
+    return _LOCAL.active
+
+
+def _fold_peak():
+    # Add the traced peak since the last reset to every stage in progress
+    _, peak = tracemalloc.get_traced_memory()
+    for memory in _MEMORY.values():
+        memory["peak"] = max(memory["peak"], peak)
+
+
+def _start_memory(record):
+    # tracemalloc has a single, process-wide peak: fold it into the stages
+    # in progress before resetting it for the new stage
+    if not tracing_memory():
+        return
+    with _MEMORY_LOCK:
+        _fold_peak()
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        _MEMORY[id(record)] = {"start": current, "peak": current}
+
+
+def _end_memory(record):
+    # Peak memory allocated during the stage on top of what was allocated
+    # when it started, in MiB
+    with _MEMORY_LOCK:
+        if id(record) not in _MEMORY:
+            return None
+        _fold_peak()
+        memory = _MEMORY.pop(id(record))
+    return (memory["peak"] - memory["start"]) / 1024**2
+
+
+def count_rows(value):
+    # Rows of a DataFrame, or of the first DataFrame in a tuple of results
+    if isinstance(value, tuple):
+        value = next((item for item in value if isinstance(item, pd.DataFrame)), None)
+    return len(value) if isinstance(value, pd.DataFrame) else None
+
+
+@contextmanager
+def stage(name, **details):
+    """Record the block as the pipeline stage ``name``.
+
+    Yields the stage record, so the block can add ``rows_in``/``rows_out``
+    or other details to it.
+    """
+    active = active_stages()
+    record = {
+        "stage": name,
+        "parent": active[-1] if active else None,
+        "started": time.time() - _RUN["started"],
+        **details,
+    }
+    wall_started = time.perf_counter()
+    STAGES.append(record)
+    active.append(name)
+    _start_memory(record)
+    cpu_started = time.process_time()
+    try:
+        yield record
+    finally:
+        record["wall_time"] = time.perf_counter() - wall_started
+        record["cpu_time"] = time.process_time() - cpu_started
+        record["peak_memory_mb"] = _end_memory(record)
+        active.pop()
+
+
+def instrumented(function):
+    """Record every call of ``function`` as a stage named after it.
+
+    The rows in are those of the first DataFrame argument and the rows out
+    those of the DataFrame (or first DataFrame of the tuple) it returns.
+    """
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with stage(function.__name__) as record:
+            arguments = (*args, *kwargs.values())
+            record["rows_in"] = next(
+                (len(arg) for arg in arguments if isinstance(arg, pd.DataFrame)), None
+            )
+            result = function(*args, **kwargs)
+            record["rows_out"] = count_rows(result)
+        return result
+
+    return wrapper
+
+
+def run_started():
+    # Start of the current run, as a Unix timestamp
+    return _RUN["started"]
+
+
+def tracing_memory():
+    # Whether the stages of the current run record their peak memory
+    return _RUN["trace_memory"] and tracemalloc.is_tracing()
+
+
+def reset(started=None, trace_memory=False):
+    """Start a new run.
+
+    Worker processes pass the parent's ``run_started()`` so their stage
+    offsets line up with the parent's. With ``trace_memory`` every stage
+    records the peak memory allocated while it runs (``peak_memory_mb``),
+    traced with tracemalloc, which slows allocations down somewhat.
+    """
+    STAGES.clear()
+    active_stages().clear()
+    with _MEMORY_LOCK:
+        _MEMORY.clear()
+    _RUN["started"] = time.time() if started is None else started
+    _RUN["trace_memory"] = trace_memory
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def write_report(path=None, **details):
+    """Write the stages recorded so far to a JSON run report.
+
+    Defaults to a timestamped file in ``REPORT_DIR``; returns the path.
+    """
+    now = datetime.now(timezone.utc)
+    if path is None:
+        path = REPORT_DIR / f"run-{now:%Y%m%dT%H%M%S}.json"
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        json.dumps(
+            {
+                "finished_at": now.isoformat(),
+                **details,
+                # From the start of the first stage to the end of the last
+                # one, so concurrent stages are not counted twice
+                "total_wall_time": max(
+                    (
+                        record["started"] + record.get("wall_time", 0)
+                        for record in STAGES
+                    ),
+                    default=0,
+                )
+                - min((record["started"] for record in STAGES), default=0),
+                "stages": STAGES,
+            },
+            indent=2,
+            default=str,
+        )
+    )
+    return path
@@ -0,0 +1,58 @@
+from sqlalchemy import delete, func, select, text
+
+from . import db
+
+# Indexes dropped from the models because a composite index now starts with
+# the same column
+SUPERSEDED_INDEXES = [
+    "ix_energy_records_countries_id",
+    "ix_energy_records_energy_use_types_id",
+    "ix_energy_records_energy_types_id",
+]
+
+
+def remove_duplicate_records():
+    """Delete energy records sharing a natural key, keeping the newest one.
+
+    Databases populated more than once before the natural-key index existed
+    hold duplicated rows, which would make creating that unique index fail.
+    """
+    from app.models import EnergyRecord, NATURAL_KEY
+
+    keep = select(func.max(EnergyRecord.id)).group_by(
+        *(getattr(EnergyRecord, column) for column in NATURAL_KEY)
+    )
+    result = db.session.execute(
+        delete(EnergyRecord)
+        .where(EnergyRecord.id.not_in(keep))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def upgrade_db():
+    """Bring an existing database up to date with the models.
+
+    Missing tables are created, indexes added to the models after a database
+    was first initialised are created on the existing tables and superseded
+    indexes are dropped and the rollup tables are rebuilt. Every
+    step is idempotent, so this can be run on each deployment.
+    """
+    # Import the models so their tables are registered on the metadata
+    from app import models  # noqa: F401
+
+    db.create_all()
+    removed = remove_duplicate_records()
+    with db.engine.begin() as connection:
+        for name in SUPERSEDED_INDEXES:
+            connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+    # Fill rollup tables created above from the existing records
+    from app.rollups import rebuild_rollups
+
+    rebuild_rollups()
+    return removed
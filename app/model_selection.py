@@ -0,0 +1,119 @@
+# model_selection.py
+"""Cross-validated selection of the imputation regressor.
+
+Candidates (decision trees of several depths and histogram gradient
+boosting) are compared with GroupKFold split by country, so no country is on
+both sides of a split. Every (candidate, fold) fit is a job in a process
+pool, and the candidate with the lowest mean RMSE is returned as a model spec
+for train_and_predict_model.
+"""
+import time
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.metrics import mean_squared_error
+from sklearn.model_selection import GroupKFold
+from sklearn.tree import DecisionTreeRegressor
+
+# Regressors a model spec can name
+ESTIMATORS = {
+    "decision_tree": DecisionTreeRegressor,
+    "hist_gradient_boosting": HistGradientBoostingRegressor,
+}
+
+# Candidate model specs compared by select_model
+CANDIDATES = [
+    *(
+        {
+            "estimator": "decision_tree",
+            "params": {"max_depth": depth, "min_samples_split": 2, "random_state": 42},
+        }
+        for depth in (5, 7, 9, 11, 13, 15, None)
+    ),
+    *(
+        {
+            "estimator": "hist_gradient_boosting",
+            "params": {"max_depth": depth, "max_iter": 200, "random_state": 42},
+        }
+        for depth in (4, 8, None)
+    ),
+]
+
+# Number of cross-validation folds (fewer if there are fewer groups)
+N_SPLITS = 5
+
+
+def build_model(model_spec):
+    # Unfitted regressor described by a {"estimator", "params"} spec
+    return ESTIMATORS[model_spec["estimator"]](**model_spec["params"])
+
+
+def fit_and_score(model_spec, X, y, train_index, test_index, target_scaler):
+    # Fit one candidate on one fold, returning its fit time and test RMSE in
+    # the original energy consumption units
+    model = clone(build_model(model_spec))
+    start = time.perf_counter()
+    model.fit(X[train_index], y[train_index])
+    fit_time = time.perf_counter() - start
+
+    def original_scale(values):
+        return target_scaler.inverse_transform(values.reshape(-1, 1)).ravel()
+
+    predictions = original_scale(model.predict(X[test_index]))
+    rmse = mean_squared_error(original_scale(y[test_index]), predictions) ** 0.5
+    return fit_time, rmse
+
+
+def select_model(
+    train_df,
+    features,
+    target_scaler,
+    candidates=CANDIDATES,
+    group_column="country",
+    n_splits=N_SPLITS,
+    n_jobs=-1,
+):
+    """Compare ``candidates`` on the preprocessed training rows.
+
+    Returns the winning model spec and one result per candidate, with its
+    mean and standard deviation of the RMSE across folds and its mean fit
+    time in seconds, sorted from best to worst.
+    """
+    X = train_df[features].to_numpy(dtype=float)
+    y = train_df["energy_consumption"].to_numpy(dtype=float)
+    groups = train_df[group_column].to_numpy()
+    n_splits = min(n_splits, len(np.unique(groups)))
+    folds = list(GroupKFold(n_splits=n_splits).split(X, y, groups))
+
+    # One process pool job per (candidate, fold) keeps all cores busy even
+    # when a few candidates are much slower to fit than the others
+    scores = Parallel(n_jobs=n_jobs)(
+        delayed(fit_and_score)(spec, X, y, train_index, test_index, target_scaler)
+        for spec in candidates
+        for train_index, test_index in folds
+    )
+
+    results = []
+    for position, spec in enumerate(candidates):
+        fit_times, rmses = zip(*scores[position * n_splits : (position + 1) * n_splits])
+        results.append(
+            {
+                **spec,
+                "rmse": float(np.mean(rmses)),
+                "rmse_std": float(np.std(rmses)),
+                "fit_time": float(np.mean(fit_times)),
+            }
+        )
+    results.sort(key=lambda result: result["rmse"])
+
+    for result in results:
+        print(
+            f"{result['estimator']} {result['params']}: "
+            f"RMSE {result['rmse']:.2f} (+/- {result['rmse_std']:.2f}), "
+            f"fit {result['fit_time']:.3f}s"
+        )
+
+    winner = {key: results[0][key] for key in ("estimator", "params")}
+    return winner, results
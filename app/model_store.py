@@ -0,0 +1,86 @@
+# model_store.py
+"""On-disk store of fitted imputation models.
+
+An artifact bundles the fitted target scaler, label encoders, feature scaler
+and regressor. It is keyed by a fingerprint of the training data and
+hyperparameters, so the pipeline only refits when either changes. latest.json
+names the most recently saved artifact.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+import joblib
+import pandas as pd
+import sklearn
+
+MODEL_DIR = Path(
+    os.environ.get(
+        "IMPUTATION_MODEL_DIR",
+        Path(__file__).resolve().parent.parent / "instance" / "models",
+    )
+)
+LATEST = "latest.json"
+
+
+def fingerprint(train_df, columns, vocabularies, params):
+    """Hash of the training rows, category vocabularies and hyperparameters.
+
+    The scikit-learn version is included as pickled estimators are not
+    guaranteed to load across versions.
+    """
+    digest = hashlib.sha256()
+    row_hashes = pd.util.hash_pandas_object(train_df[columns], index=False)
+    digest.update(row_hashes.to_numpy().tobytes())
+    digest.update(
+        json.dumps(
+            {
+                "columns": list(columns),
+                "vocabularies": vocabularies,
+                "params": params,
+                "sklearn": sklearn.__version__,
+            },
+            sort_keys=True,
+            default=str,
+        ).encode()
+    )
+    return digest.hexdigest()
+
+
+def artifact_path(key, model_dir=MODEL_DIR):
+    return Path(model_dir) / f"imputation-{key}.joblib"
+
+
+def load_artifact(key, model_dir=MODEL_DIR):
+    # Stored artifact for this fingerprint, or None if it was never saved
+    path = artifact_path(key, model_dir)
+    if not path.exists():
+        return None
+    return joblib.load(path)
+
+
+def save_artifact(key, artifact, model_dir=MODEL_DIR):
+    model_dir = Path(model_dir)
+    model_dir.mkdir(parents=True, exist_ok=True)
+    joblib.dump(artifact, artifact_path(key, model_dir))
+    set_latest(key, model_dir)
+
+
+def set_latest(key, model_dir=MODEL_DIR):
+    # Point latest.json at the artifact the pipeline used last
+    (Path(model_dir) / LATEST).write_text(
+        json.dumps(
+            {"fingerprint": key, "used_at": datetime.now(timezone.utc).isoformat()},
+            indent=2,
+        )
+    )
+
+
+def load_latest_artifact(model_dir=MODEL_DIR):
+    # Most recently saved artifact, or None if no model has been trained yet
+    latest = Path(model_dir) / LATEST
+    if not latest.exists():
+        return None
+    return load_artifact(json.loads(latest.read_text())["fingerprint"], model_dir)
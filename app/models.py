@@ -27,24 +27,105 @@ class EnergyUseType(db.Model):
 class Units(db.Model):
     __tablename__ = "units"
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String, nullable=False)
+    name = db.Column(db.String, nullable=False, unique=True, index=True)
     energy_records = db.relationship("EnergyRecord", backref="units", lazy=True)
 
 
 class EnergyRecord(db.Model):
     __tablename__ = "energy_records"
-    id = db.Column(db.Integer, primary_key=True)
-    countries_id = db.Column(
-        db.Integer, db.ForeignKey("countries.id"), nullable=False, index=True
+    # Natural key: one consumption value per country, energy type, use type,
+    # unit and year
+    __table_args__ = (
+        db.Index(
+            "ix_energy_records_natural_key",
+            "countries_id",
+            "energy_types_id",
+            "energy_use_types_id",
+            "units_id",
+            "year",
+            unique=True,
+        ),
+        # Keyset pagination by (countries_id, year, id): the index entries
+        # end with the rowid, so they are already in keyset order
+        db.Index("ix_energy_records_country_year_id", "countries_id", "year"),
+        # Covering index for aggregates grouped or filtered by country and year
+        db.Index(
+            "ix_energy_records_country_year",
+            "countries_id",
+            "year",
+            "energy_use_types_id",
+            "energy_consumption",
+        ),
+        # Covering index for aggregates filtered by energy type and unit
+        db.Index(
+            "ix_energy_records_energy_type_unit_year",
+            "energy_types_id",
+            "units_id",
+            "year",
+            "energy_consumption",
+        ),
+        # Covering index for aggregates grouped or filtered by use type
+        db.Index(
+            "ix_energy_records_use_type_country_year",
+            "energy_use_types_id",
+            "countries_id",
+            "year",
+            "energy_consumption",
+        ),
     )
+    id = db.Column(db.Integer, primary_key=True)
+    countries_id = db.Column(db.Integer, db.ForeignKey("countries.id"), nullable=False)
     energy_types_id = db.Column(
-        db.Integer, db.ForeignKey("energy_types.id"), nullable=False, index=True
+        db.Integer, db.ForeignKey("energy_types.id"), nullable=False
     )
     energy_use_types_id = db.Column(
-        db.Integer, db.ForeignKey("energy_use_types.id"), nullable=False, index=True
+        db.Integer, db.ForeignKey("energy_use_types.id"), nullable=False
     )
     units_id = db.Column(
         db.Integer, db.ForeignKey("units.id"), nullable=False, index=True
     )
     year = db.Column(db.Integer, nullable=False)
     energy_consumption = db.Column(db.Float, nullable=False)
+
+
+NATURAL_KEY = (
+    "countries_id",
+    "energy_types_id",
+    "energy_use_types_id",
+    "units_id",
+    "year",
+)
+
+
+# Rollup tables: energy_records pre-aggregated per pair of dimensions, kept
+# up to date by every write (see app/rollups.py) so the aggregate endpoint
+# reads one row per group instead of every record
+class RollupMixin:
+    energy_consumption_sum = db.Column(db.Float, nullable=False)
+    record_count = db.Column(db.Integer, nullable=False)
+
+
+class CountryYearRollup(RollupMixin, db.Model):
+    __tablename__ = "rollup_country_year"
+    countries_id = db.Column(
+        db.Integer, db.ForeignKey("countries.id"), primary_key=True
+    )
+    year = db.Column(db.Integer, primary_key=True)
+
+
+class UseTypeYearRollup(RollupMixin, db.Model):
+    __tablename__ = "rollup_use_type_year"
+    energy_use_types_id = db.Column(
+        db.Integer, db.ForeignKey("energy_use_types.id"), primary_key=True
+    )
+    year = db.Column(db.Integer, primary_key=True)
+
+
+class CountryUseTypeRollup(RollupMixin, db.Model):
+    __tablename__ = "rollup_country_use_type"
+    countries_id = db.Column(
+        db.Integer, db.ForeignKey("countries.id"), primary_key=True
+    )
+    energy_use_types_id = db.Column(
+        db.Integer, db.ForeignKey("energy_use_types.id"), primary_key=True
+    )
@@ -0,0 +1,95 @@
+import base64
+import binascii
+import json
+
+from sqlalchemy import tuple_
+
+from app.models import EnergyRecord
+
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+
+# Keyset orderings supported by the listing endpoint. Every key ends with the
+# primary key so the ordering is total and stable between requests.
+KEYSETS = {
+    "id": (EnergyRecord.id,),
+    "country_year": (EnergyRecord.countries_id, EnergyRecord.year, EnergyRecord.id),
+}
+
+
+class PaginationError(ValueError):
+    """Raised when the pagination query parameters are invalid."""
+
+
+def encode_cursor(order, values):
+    # Opaque, URL-safe token holding the ordering name and the last key seen
+    payload = json.dumps([order, list(values)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        order, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, TypeError):
+        raise PaginationError("Invalid cursor")
+
+    # A crafted cursor may hold any JSON; check the types before using them
+    if not isinstance(order, str) or not isinstance(values, list):
+        raise PaginationError("Invalid cursor")
+    if order not in KEYSETS or len(values) != len(KEYSETS[order]):
+        raise PaginationError("Invalid cursor")
+    if not all(
+        isinstance(value, int) and not isinstance(value, bool) for value in values
+    ):
+        raise PaginationError("Invalid cursor")
+    return order, values
+
+
+def parse_page_args(args):
+    """Return ``(order, after_values, limit)`` from the request query string."""
+    try:
+        limit = int(args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise PaginationError("limit must be an integer")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise PaginationError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    order = args.get("order", "id")
+    if order not in KEYSETS:
+        raise PaginationError(f"order must be one of: {', '.join(KEYSETS)}")
+
+    after_values = None
+    if args.get("after"):
+        cursor_order, after_values = decode_cursor(args["after"])
+        if cursor_order != order:
+            raise PaginationError("Cursor was issued for a different order")
+
+    return order, after_values, limit
+
+
+def keyset_page(session, stmt, order, after_values, limit):
+    """Apply the keyset condition, ordering and limit to the ``stmt`` select.
+
+    The key columns are appended to the projection so the cursor can be built
+    from the last row, and stripped again from the returned rows. One extra
+    row is fetched to know whether a further page exists without issuing a
+    COUNT query. Returns ``(rows, next_cursor)``.
+    """
+    columns = KEYSETS[order]
+    width = len(stmt.selected_columns)
+
+    stmt = stmt.add_columns(*columns)
+    if after_values is not None:
+        if len(columns) == 1:
+            stmt = stmt.where(columns[0] > after_values[0])
+        else:
+            stmt = stmt.where(tuple_(*columns) > tuple_(*after_values))
+
+    rows = session.execute(stmt.order_by(*columns).limit(limit + 1)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(order, rows[-1][width:])
+    return [row[:width] for row in rows], next_cursor
@@ -1,107 +1,221 @@
 # populate_db.py
+import argparse
 import sys
+import time
 import pandas as pd
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
 
 from app import create_app, db
-from app.models import Countries, EnergyType, EnergyUseType, Units, EnergyRecord
-from process_energy_data import process_and_predict_energy_consumption
+from app.database import dialect_insert
+from app.dimension_cache import invalidate_dimensions
+from app.rollups import apply_rollup_changes, stored_records
+from app.models import (
+    Countries,
+    EnergyType,
+    EnergyUseType,
+    Units,
+    EnergyRecord,
+    NATURAL_KEY,
+)
+from dataset_catalogue import CATALOGUE
+from process_energy_data import process_catalogue
+from eurostat_cache import OFFLINE
+from instrumentation import instrumented, reset, write_report
 
 """_summary_
-    We populate our database in bulk using a batch processing strategy. This approach involves gathering a set of records in memory before inserting them collectively, optimizing the process of data insertion.
+    We populate our database in bulk using a batch processing strategy. Records are inserted in fixed-size chunks with plain Core executemany statements and committed per chunk, so memory use stays bounded however many rows are loaded.
     """
 
 
-# Function to get or create objects and return a mapping
-def get_or_create_object(session, model, **kwargs):
-    instance = session.query(model).filter_by(**kwargs).first()
-    if instance:
-        return instance
-    else:
-        instance = model(**kwargs)
-        session.add(instance)
-        try:
-            session.flush()  # Attempt to flush objects to the database
-        except IntegrityError:  # Catch duplicates and other database integrity issues
-            session.rollback()  # Flush failed, object likely already exists
-            instance = (
-                session.query(model).filter_by(**kwargs).first()
-            )  # Try to get it again
-        return instance
-
-
-# Load and insert data using bulk operations
-def load_data(session, data):
-    # Maps to store references to already created objects
-    countries_lookup = {}
-    energy_type_lookup = {}
-    energy_use_type_lookup = {}
-    units_lookup = {}
-
-    # List to hold new EnergyRecord objects for bulk insertion
-    records_to_insert = []
-
-    for entry in data:
-        energy_consumption = (
-            float(entry["energy_consumption"])
-            if pd.notna(entry["energy_consumption"])
-            else None
+# Number of fact rows inserted and committed per transaction
+CHUNK_SIZE = 10000
+
+# Dimension tables as (model, name column, DataFrame column)
+DIMENSIONS = [
+    (Countries, "name", "countries"),
+    (EnergyType, "code", "energy_types"),
+    (EnergyUseType, "type", "energy_use_types"),
+    (Units, "name", "units"),
+]
+
+
+# Insert missing dimension values and return a name -> id mapping
+def upsert_dimension(session, model, column, values):
+    table = model.__table__
+    values = list(values)
+    if values:
+        session.execute(
+            dialect_insert(session, table).on_conflict_do_nothing(
+                index_elements=[column]
+            ),
+            [{column: value} for value in values],
         )
-        year = entry["year"]
-        countries = entry["countries"]
-        energy_types = entry["energy_types"]
-        energy_use_types = entry["energy_use_types"]
-        units = entry["units"]
-
-        # Get or create related objects and update lookups
-        if countries not in countries_lookup:
-            countries_lookup[countries] = get_or_create_object(
-                session, Countries, name=countries
-            )
-        if energy_types not in energy_type_lookup:
-            energy_type_lookup[energy_types] = get_or_create_object(
-                session, EnergyType, code=energy_types
-            )
-        if energy_use_types not in energy_use_type_lookup:
-            energy_use_type_lookup[energy_use_types] = get_or_create_object(
-                session, EnergyUseType, type=energy_use_types
-            )
-        if units not in units_lookup:
-            units_lookup[units] = get_or_create_object(session, Units, name=units)
-
-        # Create new EnergyRecord object
-        records_to_insert.append(
-            EnergyRecord(
-                countries_id=countries_lookup[countries].id,
-                energy_types_id=energy_type_lookup[energy_types].id,
-                energy_use_types_id=energy_use_type_lookup[energy_use_types].id,
-                units_id=units_lookup[units].id,
-                year=year,
-                energy_consumption=energy_consumption,
-            )
+    rows = session.execute(
+        select(table.c[column], table.c.id).where(table.c[column].in_(values))
+    )
+    return pd.Series(dict(rows.all()), dtype="Int64")
+
+
+# Map the dimension columns of the DataFrame to foreign key ids
+def map_dimension_ids(session, data_df):
+    records = pd.DataFrame(index=data_df.index)
+
+    # One upsert and one id lookup per dimension table, then map the fact
+    # columns to foreign keys in a single vectorised pass per column
+    for model, column, data_column in DIMENSIONS:
+        id_map = upsert_dimension(
+            session, model, column, data_df[data_column].dropna().unique()
         )
+        records[f"{model.__tablename__}_id"] = data_df[data_column].map(id_map)
 
-    # Bulk insert new records
-    session.bulk_save_objects(records_to_insert)
+    records["year"] = data_df["year"].astype(int)
+    records["energy_consumption"] = data_df["energy_consumption"].astype(float)
     session.commit()
+    return records
+
+
+# Upsert on the natural key, only rewriting rows whose consumption changed
+def upsert_records_stmt(session):
+    table = EnergyRecord.__table__
+    stmt = dialect_insert(session, table)
+    return stmt.on_conflict_do_update(
+        index_elements=list(NATURAL_KEY),
+        set_={"energy_consumption": stmt.excluded.energy_consumption},
+        where=table.c.energy_consumption != stmt.excluded.energy_consumption,
+    )
+
+
+# Load and insert data in chunks using Core executemany
+@instrumented
+def load_data(session, data_df, chunk_size=CHUNK_SIZE, incremental=False):
+    """Load the processed DataFrame into energy_records.
+
+    By default every row is inserted, which suits a freshly initialised
+    database. With ``incremental=True`` rows are upserted on the natural key,
+    so re-running a refresh inserts new records, updates the ones whose
+    consumption changed and leaves unchanged records untouched.
+
+    The rollup tables are updated with each chunk, in its transaction.
+    """
+    records = map_dimension_ids(session, data_df)
+    if incremental:
+        insert_stmt = upsert_records_stmt(session)
+    else:
+        insert_stmt = insert(EnergyRecord.__table__)
+
+    started = time.perf_counter()
+    loaded = 0
+    changed = 0
+    for start in range(0, len(records), chunk_size):
+        chunk = records.iloc[start : start + chunk_size]
+
+        # Plain parameter rows, missing values (NaN / NA) passed as NULL
+        rows = chunk.astype(object).where(chunk.notna(), None).to_dict("records")
+        # Values the upsert is about to replace
+        replaced = stored_records(session, rows) if incremental else []
+        result = session.execute(insert_stmt, rows)
+        apply_rollup_changes(session, added=rows, removed=replaced)
+        session.commit()
+
+        loaded += len(rows)
+        changed += max(result.rowcount, 0)
+        elapsed = time.perf_counter() - started
+        print(
+            f"Processed {loaded} rows, {changed} inserted or updated "
+            f"({loaded / elapsed:,.0f} rows/sec)"
+        )
+
+    # Running API processes reload the dimension ids and drop cached responses
+    invalidate_dimensions()
+    return changed
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Populate the energy database.")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=CHUNK_SIZE,
+        help="number of records inserted and committed per transaction",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="upsert on the natural key, only touching new or changed records",
+    )
+    parser.add_argument(
+        "--refresh-data",
+        action="store_true",
+        help="download the Eurostat datasets even if fresh cached copies exist",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        default=OFFLINE,
+        help="run only from cached Eurostat datasets, without network access",
+    )
+    parser.add_argument(
+        "--select-model",
+        action="store_true",
+        help="cross-validate candidate regressors and impute with the best one",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=-1,
+        help="worker processes for the model selection (default: all cores)",
+    )
+    parser.add_argument(
+        "--datasets",
+        nargs="+",
+        choices=[spec["code"] for spec in CATALOGUE],
+        help="catalogue datasets to ingest (default: all of them)",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="record the peak memory of every stage in the run report "
+        "(traced with tracemalloc, which slows the run down)",
+    )
+    parser.add_argument(
+        "--report",
+        help="path of the JSON run report with per-stage timings "
+        "(default: a timestamped file in instance/run_reports)",
+    )
+    args = parser.parse_args()
+
+    reset(trace_memory=args.trace_memory)
+
     app = create_app()
     with app.app_context():
-        # Extract data
-        data_df = process_and_predict_energy_consumption()
-
-        # Convert DataFrame to a list of dictionaries
-        data = data_df.to_dict("records")
+        # Extract data of the selected catalogue datasets
+        catalogue = [
+            spec
+            for spec in CATALOGUE
+            if not args.datasets or spec["code"] in args.datasets
+        ]
+        data_df = process_catalogue(
+            catalogue,
+            force_refresh=args.refresh_data,
+            offline=args.offline,
+            select_model=args.select_model,
+            n_jobs=args.jobs,
+        )
 
         # Insert data in a new session with bulk operations
         session = Session(bind=db.engine)
         try:
-            load_data(session, data)
+            load_data(
+                session,
+                data_df,
+                chunk_size=args.chunk_size,
+                incremental=args.incremental,
+            )
             print("Data inserted successfully")
         except Exception as e:
             print(f"Error during bulk insert: {e}", file=sys.stderr)
         finally:
             session.close()
+            report_path = write_report(args.report, arguments=vars(args))
+            print(f"Run report written to {report_path}")
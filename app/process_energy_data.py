@@ -1,20 +1,80 @@
 # Importing necessary Libraries
-import eurostat
 import pandas as pd
 import numpy as np
-from sklearn.tree import DecisionTreeRegressor
-from sklearn.preprocessing import LabelEncoder
-from sklearn.preprocessing import PowerTransformer
+import os
 import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 warnings.filterwarnings("ignore")
 
 from notebooks.eurostat_dictionary import country_dictionary, energy_types_dict
-
-
+from dataset_catalogue import CATALOGUE, HOUSEHOLD_ENERGY, HOUSEHOLDS
+from eurostat_cache import DOWNLOAD_RETRIES, DOWNLOAD_TIMEOUT, OFFLINE, get_data_df
+from instrumentation import (
+    STAGES,
+    instrumented,
+    reset,
+    run_started,
+    stage,
+    tracing_memory,
+)
+from imputation_model import FEATURES, fit_preprocessors, transform_features
+from model_selection import build_model, select_model
+from model_store import (
+    MODEL_DIR,
+    fingerprint,
+    load_artifact,
+    save_artifact,
+    set_latest,
+)
+
+
+# Years kept by the pipeline
+YEAR_RANGE = (2012, 2021)
+
+# Columns the melted household datasets are merged on
+COMMON_COLS = ["freq", "geo\\TIME_PERIOD", "year"]
+
+# Catalogue entry keys passed on to load_and_melt
+LOAD_ARGUMENTS = [
+    "code",
+    "id_vars",
+    "value_name",
+    "total_columns",
+    "filters",
+    "year_range",
+    "timeout",
+    "retries",
+]
+
+# Columns of the processed star schema rows, and their natural key
+FACT_COLUMNS = [
+    "countries",
+    "energy_types",
+    "energy_use_types",
+    "year",
+    "energy_consumption",
+    "units",
+]
+FACT_KEY = ["countries", "energy_types", "energy_use_types", "units", "year"]
+
+# Hyperparameters of the energy consumption imputation model
+TREE_PARAMS = {"max_depth": 11, "min_samples_split": 2, "random_state": 42}
+
+# Regressor used unless the model selection stage picks another one
+DEFAULT_MODEL = {"estimator": "decision_tree", "params": TREE_PARAMS}
+
+
+@instrumented
 def melt_and_sort(df, id_vars, value_name, sort_by, value_vars=None):
     # Use `pd.melt` to transform the DataFrame
-    melted_df = pd.melt(df, id_vars=id_vars, var_name="year", value_name=value_name)
+    melted_df = pd.melt(
+        df,
+        id_vars=id_vars,
+        value_vars=value_vars,
+        var_name="year",
+        value_name=value_name,
+    )
 
     # Convert 'year' to an integer type and sort the DataFrame
     melted_df["year"] = melted_df["year"].astype(int)
@@ -23,25 +83,118 @@ def melt_and_sort(df, id_vars, value_name, sort_by, value_vars=None):
     return melted_df
 
 
-def load_and_melt(code, id_vars, value_name, sort_by):
-    # Load data using the eurostat API
-    df = eurostat.get_data_df(code)
+def to_categorical(df, columns):
+    # Dimension columns as pandas Categorical, so filtering and mapping work on
+    # the few distinct categories instead of on every row. Converted column by
+    # column, in place, so the large block of year columns is not copied.
+    for column in columns:
+        df[column] = df[column].astype("category")
+    return df
+
+
+def category_mask(series, predicate):
+    # Evaluate `predicate` once per category and broadcast the result to the
+    # rows through the category codes (code -1, a missing value, never matches)
+    matches = np.asarray(predicate(series.cat.categories), dtype=bool)
+    return np.append(matches, False)[series.cat.codes.to_numpy()]
+
+
+def align_categories(left, right, columns):
+    # Give shared categorical columns the same categories so merging on them
+    # keeps the categorical dtype instead of falling back to object
+    for column in columns:
+        if isinstance(left[column].dtype, pd.CategoricalDtype):
+            categories = left[column].cat.categories.union(right[column].cat.categories)
+            dtype = pd.CategoricalDtype(categories)
+            left[column] = left[column].astype(dtype)
+            right[column] = right[column].astype(dtype)
+    return left, right
+
+
+def year_columns(df, id_vars, year_range=YEAR_RANGE):
+    # Year columns of a wide Eurostat frame that fall within the year range
+    first_year, last_year = year_range
+    return [
+        column
+        for column in df.columns
+        if column not in id_vars and first_year <= int(column) <= last_year
+    ]
+
+
+@instrumented
+def load_and_melt(
+    code,
+    id_vars,
+    value_name,
+    sort_by,
+    total_columns=(),
+    filters=None,
+    year_range=YEAR_RANGE,
+    force_refresh=False,
+    offline=OFFLINE,
+    timeout=DOWNLOAD_TIMEOUT,
+    retries=DOWNLOAD_RETRIES,
+):
+    # Load data using the eurostat API, through the local dataset cache
+    with stage("download", dataset=code) as record:
+        df = get_data_df(
+            code,
+            force_refresh=force_refresh,
+            offline=offline,
+            timeout=timeout,
+            retries=retries,
+        )
+        record["rows_out"] = len(df)
+    df = to_categorical(df, id_vars)
+
+    # Filter rows and year columns on the wide frame, before melting
+    df = filter_data(df, total_columns, filters)
+    value_vars = year_columns(df, id_vars, year_range)
 
     # Melt and sort the DataFrame
-    melted_df = melt_and_sort(df, id_vars, value_name, sort_by)
+    melted_df = melt_and_sort(df, id_vars, value_name, sort_by, value_vars)
 
     return melted_df
 
 
+def load_arguments(spec):
+    # load_and_melt keyword arguments of a catalogue entry
+    return {key: spec[key] for key in LOAD_ARGUMENTS if key in spec}
+
+
+def load_datasets(datasets, sort_by, force_refresh=False, offline=OFFLINE):
+    """Load and melt every catalogue entry of ``datasets`` concurrently.
+
+    The downloads are I/O bound, so each dataset gets its own thread and the
+    extraction takes as long as the slowest dataset rather than the sum of
+    all of them. Returns the melted DataFrames in the order of ``datasets``.
+    """
+    with ThreadPoolExecutor(max_workers=len(datasets)) as executor:
+        futures = [
+            executor.submit(
+                load_and_melt,
+                sort_by=sort_by,
+                force_refresh=force_refresh,
+                offline=offline,
+                **load_arguments(spec),
+            )
+            for spec in datasets
+        ]
+        return [future.result() for future in futures]
+
+
+@instrumented
 def rename_columns(df):
     # Rename specific columns
     df.rename(columns={"geo\TIME_PERIOD": "geo", "siec": "energy_types"}, inplace=True)
 
-    # Map 'geo' to 'country' using a dictionary
-    df["country"] = df["geo"].replace(country_dictionary)
+    # Map 'geo' to 'country' using a dictionary (applied to the categories)
+    df["country"] = df["geo"].map(lambda code: country_dictionary.get(code, code))
 
     # Map 'nrg_bal' to 'energy_use_types' using a dictionary
-    df["energy_use_types"] = df["nrg_bal"].replace(energy_types_dict)
+    df["energy_use_types"] = df["nrg_bal"].map(
+        lambda code: energy_types_dict.get(code, code)
+    )
 
     # Rename unit columns
     df.rename(
@@ -55,205 +208,214 @@ def rename_columns(df):
     return df
 
 
-def filter_data(df):
-    # Define a list of relevant energy use types
-    energy_use_types = [
-        "h_energy_use",
-        "h_cooking",
-        "h_space_heating",
-        "h_water_heating",
-        "h_space_cooling",
-    ]
-
-    # Filter DataFrame based on energy use types
-    df = df[df["energy_use_types"].isin(energy_use_types)]
+@instrumented
+def filter_data(df, total_columns=(), filters=None):
+    # Build a single row mask from the categorical dimension columns
+    mask = np.ones(len(df), dtype=bool)
 
-    # Filter DataFrame based on the year range
-    df = df[(df["year"] >= 2012) & (df["year"] <= 2021)]
+    # Keep rows whose dimension columns contain 'TOTAL' (case-insensitive)
+    for column in total_columns:
+        mask &= category_mask(
+            df[column], lambda categories: categories.str.contains("TOTAL", case=False)
+        )
 
-    # Filter DataFrame based on energy types containing 'TOTAL' (case-insensitive)
-    columns_to_filter = ["energy_types", "agechild", "hhcomp", "n_child"]
-    for column in columns_to_filter:
-        df = df[df[column].str.contains("TOTAL", case=False)].reset_index(drop=True)
+    # Keep rows whose dimension columns hold one of the listed codes
+    for column, values in (filters or {}).items():
+        mask &= category_mask(df[column], lambda categories: categories.isin(values))
 
-    return df
+    return df[mask].reset_index(drop=True)
 
 
-def preprocess_data(df, features):
+@instrumented
+def preprocess_data(df, features, preprocessors=None):
     # Take out the missing values from the filtered dataset and use them for training models.
-    train_df = df.dropna(
-        subset=["energy_consumption"]
-    )  # Rows with non-missing 'energy_consumption'
+    train_df = df.dropna(subset=["energy_consumption"])
 
     # Selecting rows with missing values in the 'energy_consumption' column for prediction
-    missing_values_to_predict = df[df["energy_consumption"].isnull()]
+    missing_values_to_predict = df[df["energy_consumption"].isnull()].copy()
 
-    # Scale energy_consumption for training data
-    tscale = PowerTransformer()
-    train_df["energy_consumption"] = tscale.fit_transform(
+    # Fit the preprocessing steps unless fitted ones are reused from the store
+    if preprocessors is None:
+        preprocessors = fit_preprocessors(df, train_df)
+
+    # Scale energy_consumption and the features of the training data
+    train_df = transform_features(train_df, preprocessors)
+    train_df["energy_consumption"] = preprocessors["target_scaler"].transform(
         train_df[["energy_consumption"]]
     )
 
-    # Select relevant features for prediction on missing values
-    selected_features_missing_values = missing_values_to_predict[features]
-
-    # Convert categorical features to numeric using LabelEncoder for training
-    labelencoder = LabelEncoder()
-    train_df["country"] = labelencoder.fit_transform(train_df["country"])
-    train_df["energy_use_types"] = labelencoder.fit_transform(
-        train_df["energy_use_types"]
+    # Same preprocessing for the features of the rows to predict
+    selected_features_missing_values = transform_features(
+        missing_values_to_predict[features], preprocessors
     )
-    train_df["year"] = train_df["year"].astype("category")
-
-    # Scale numerical features using PowerTransformer for training
-    scaler = PowerTransformer()
-    numerical_features = ["country", "number_of_households", "energy_use_types"]
-    train_df[numerical_features] = scaler.fit_transform(train_df[numerical_features])
 
-    # Convert categorical features to numeric using LabelEncoder for prediction data
-    selected_features_missing_values["country"] = labelencoder.fit_transform(
-        selected_features_missing_values["country"]
-    )
-    selected_features_missing_values["energy_use_types"] = labelencoder.fit_transform(
-        selected_features_missing_values["energy_use_types"]
-    )
-    selected_features_missing_values["year"] = selected_features_missing_values[
-        "year"
-    ].astype("category")
-
-    # Scale numerical features using the same scaler that was fit on the training data
-    selected_features_missing_values[numerical_features] = scaler.transform(
-        selected_features_missing_values[numerical_features]
+    return (
+        train_df,
+        selected_features_missing_values,
+        preprocessors,
+        missing_values_to_predict,
     )
 
-    return train_df, selected_features_missing_values, tscale, missing_values_to_predict
-
 
+@instrumented
 def train_and_predict_model(
     features,
     train_df,
     selected_features_missing_values,
-    tscale,
+    preprocessors,
     missing_values_to_predict,
+    model=None,
+    model_spec=DEFAULT_MODEL,
 ):
-    # Splitting features and target variable for train_df
-    X = train_df[features]
-    y = train_df["energy_consumption"]
+    # Train the regressor of `model_spec` unless a fitted model is reused
+    if model is None:
+        # Splitting features and target variable for train_df
+        X = train_df[features]
+        y = train_df["energy_consumption"]
 
-    # Initialize the Decision Tree Regressor model for final prediction
-    final_tree_model = DecisionTreeRegressor(
-        max_depth=11, min_samples_split=2, random_state=42
-    )
+        # Initialize the regressor (by default a Decision Tree) for final prediction
+        model = build_model(model_spec)
 
-    # Train the model on the entire training data
-    final_tree_model.fit(X, y)
+        # Train the model on the entire training data
+        model.fit(X, y)
 
     # Use the trained model to predict the missing values in the 'energy_consumption' column
-    missing_values_predictions_scaled = final_tree_model.predict(
-        selected_features_missing_values
-    )
+    missing_values_predictions_scaled = model.predict(selected_features_missing_values)
 
     # Inverse transform the scaled predictions to the original scale using target scaler
-    missing_values_predictions_original_scale = tscale.inverse_transform(
-        missing_values_predictions_scaled.reshape(-1, 1)
-    )
+    missing_values_predictions_original_scale = preprocessors[
+        "target_scaler"
+    ].inverse_transform(missing_values_predictions_scaled.reshape(-1, 1))
 
     # Assign the unscaled predictions to the missing values prediction
     missing_values_to_predict[
         "energy_consumption"
     ] = missing_values_predictions_original_scale
 
-    return missing_values_to_predict
+    return missing_values_to_predict, model
 
 
-def train_and_predict_model(
-    features,
-    train_df,
-    selected_features_missing_values,
-    tscale,
-    missing_values_to_predict,
+def impute_energy_consumption(
+    df, features, model_dir=MODEL_DIR, select=False, n_jobs=-1
 ):
-    # Splitting features and target variable for train_df
-    X = train_df[features]
-    y = train_df["energy_consumption"]
-
-    # Initialize the Decision Tree Regressor model for final prediction
-    final_tree_model = DecisionTreeRegressor(
-        max_depth=11, min_samples_split=2, random_state=42
-    )
-
-    # Train the model on the entire training data
-    final_tree_model.fit(X, y)
+    """Predict the missing 'energy_consumption' values of ``df``.
 
-    # Use the trained model to predict the missing values in the 'energy_consumption' column
-    missing_values_predictions_scaled = final_tree_model.predict(
-        selected_features_missing_values
+    The fitted preprocessors and model are stored under a fingerprint of the
+    training rows, category vocabularies and model spec, and reused as long
+    as that fingerprint is unchanged. With ``select`` the regressor is first
+    chosen by cross-validating the candidates of model_selection.py over
+    ``n_jobs`` processes; otherwise ``DEFAULT_MODEL`` is used.
+    """
+    train_rows = df.dropna(subset=["energy_consumption"])
+    vocabularies = {
+        column: sorted(df[column].dropna().unique().tolist())
+        for column in ["country", "energy_use_types"]
+    }
+
+    model_spec, selection, preprocessed = DEFAULT_MODEL, None, None
+    if select:
+        preprocessed = preprocess_data(df, features)
+        train_df, _, preprocessors, _ = preprocessed
+        with stage("select_model") as record:
+            record["rows_in"] = len(train_df)
+            model_spec, selection = select_model(
+                train_df, features, preprocessors["target_scaler"], n_jobs=n_jobs
+            )
+
+    key = fingerprint(
+        train_rows, features + ["energy_consumption"], vocabularies, model_spec
     )
+    artifact = load_artifact(key, model_dir)
+
+    # The preprocessors fitted for the selection equal the stored ones, as
+    # both were fitted on the same fingerprinted data
+    if preprocessed is None:
+        preprocessed = preprocess_data(
+            df, features, artifact["preprocessors"] if artifact is not None else None
+        )
+    (
+        train_df,
+        selected_features_missing_values,
+        preprocessors,
+        missing_values_to_predict,
+    ) = preprocessed
 
-    # Inverse transform the scaled predictions to the original scale using target scaler
-    missing_values_predictions_original_scale = tscale.inverse_transform(
-        missing_values_predictions_scaled.reshape(-1, 1)
+    # Predict missing values in 'energy_consumption' using the selected model
+    missing_values_to_predict, model = train_and_predict_model(
+        features,
+        train_df,
+        selected_features_missing_values,
+        preprocessors,
+        missing_values_to_predict,
+        artifact["model"] if artifact is not None else None,
+        model_spec,
     )
 
-    # Assign the unscaled predictions to the missing values prediction
-    missing_values_to_predict[
-        "energy_consumption"
-    ] = missing_values_predictions_original_scale
+    if artifact is None:
+        save_artifact(
+            key,
+            {
+                "preprocessors": preprocessors,
+                "model": model,
+                "features": features,
+                "params": model_spec,
+                "selection": selection,
+            },
+            model_dir,
+        )
+    else:
+        set_latest(key, model_dir)
 
     return missing_values_to_predict
 
 
-def process_and_predict_energy_consumption():
+def process_and_predict_energy_consumption(
+    force_refresh=False,
+    offline=OFFLINE,
+    select_model=False,
+    n_jobs=-1,
+    dataset=HOUSEHOLD_ENERGY,
+):
     """
     Load, process, and predict missing values in energy consumption data.
-    """
-
-    # Define common column names
-    common_cols = ["freq", "geo\\TIME_PERIOD", "year"]
 
-    # Load, process, and merge the DataFrames
-    energy_df_melted = load_and_melt(
-        "nrg_d_hhq",
-        id_vars=["freq", "nrg_bal", "siec", "unit", "geo\\TIME_PERIOD"],
-        value_name="energy_consumption",
-        sort_by=common_cols,
-    )
+    ``dataset`` is the household energy catalogue entry, merged with the
+    number of households to impute its missing values. Eurostat datasets are
+    read from the on-disk cache when possible; ``force_refresh`` downloads
+    them again and ``offline`` never contacts Eurostat. ``select_model`` runs
+    the model selection stage over ``n_jobs`` worker processes (all cores by
+    default) before imputing.
+    """
 
-    household_melted_df = load_and_melt(
-        "lfst_hhnhtych",
-        id_vars=["freq", "agechild", "n_child", "hhcomp", "unit", "geo\\TIME_PERIOD"],
-        value_name="number_of_households",
-        sort_by=common_cols,
+    # Load, filter and melt the datasets concurrently
+    melted_dfs = load_datasets(
+        [dataset, HOUSEHOLDS],
+        COMMON_COLS,
+        force_refresh=force_refresh,
+        offline=offline,
     )
 
     # Merge the melted DataFrames on common columns
-    merged_df = pd.merge(energy_df_melted, household_melted_df, on=common_cols)
+    with stage("merge") as record:
+        record["rows_in"] = sum(len(df) for df in melted_dfs)
+        merged_df = melted_dfs[0]
+        for melted_df in melted_dfs[1:]:
+            merged_df, melted_df = align_categories(merged_df, melted_df, COMMON_COLS)
+            merged_df = pd.merge(merged_df, melted_df, on=COMMON_COLS)
+        record["rows_out"] = len(merged_df)
 
-    # Apply the column renaming and data filtering functions
-    merged_df = rename_columns(merged_df)
-    filtered_df = filter_data(merged_df)
+    # Apply the column renaming; rows and years were filtered before melting
+    filtered_df = rename_columns(merged_df)
 
     # Imputing Number of household missing values with Median
-    filtered_df["number_of_households"].fillna(
-        filtered_df["number_of_households"].median(), inplace=True
+    filtered_df["number_of_households"] = filtered_df["number_of_households"].fillna(
+        filtered_df["number_of_households"].median()
     )
 
-    # Selecting relevant features for prediction
-    features = ["country", "number_of_households", "year", "energy_use_types"]
-    (
-        train_df,
-        selected_features_missing_values,
-        tscale,
-        missing_values_to_predict,
-    ) = preprocess_data(filtered_df, features)
-
-    # Predict missing values in 'energy_consumption' using the Decision Tree Regressor model
-    missing_values_to_predict = train_and_predict_model(
-        features,
-        train_df,
-        selected_features_missing_values,
-        tscale,
-        missing_values_to_predict,
+    # Predict missing 'energy_consumption' values, reusing the stored model
+    # when the training data is unchanged
+    missing_values_to_predict = impute_energy_consumption(
+        filtered_df, FEATURES, select=select_model, n_jobs=n_jobs
     )
 
     # Filling the missing data using common index in both DataFrames for the final dataset.
@@ -266,16 +428,133 @@ def process_and_predict_energy_consumption():
         columns={"country": "countries", "energy_unit": "units"}, inplace=True
     )
 
-    train_df["year"] = train_df["year"].astype(int)
-
-    enery_columns = [
-        "countries",
-        "energy_types",
-        "energy_use_types",
-        "year",
-        "energy_consumption",
-        "units",
-    ]
-    filtered_df = filtered_df[enery_columns]
+    filtered_df = filtered_df[FACT_COLUMNS]
 
     return filtered_df
+
+
+def convert_units(facts, unit):
+    # Express the values in the target unit of the catalogue entry's unit
+    # handling; rows already in it take precedence over converted rows
+    target, conversions = unit["target"], unit.get("conversions", {})
+    factors = facts["units"].astype(str).map({target: 1.0, **conversions})
+    facts = facts[factors.notna()].copy()
+    factors = factors[factors.notna()]
+
+    converted = facts["units"].astype(str) != target
+    facts["energy_consumption"] = facts["energy_consumption"] * factors
+    facts["units"] = target
+    return (
+        facts.assign(converted=converted)
+        .sort_values("converted", kind="stable")
+        .drop_duplicates(subset=FACT_KEY)
+        .drop(columns="converted")
+    )
+
+
+@instrumented
+def process_dataset(spec, force_refresh=False, offline=OFFLINE):
+    """Process a catalogue entry into star schema rows.
+
+    Rows without a value are dropped: only the household energy table is
+    imputed, by process_and_predict_energy_consumption.
+    """
+    sources = [source for source, _ in spec["dimensions"].values()]
+    melted_df = load_and_melt(
+        sort_by=sources + ["year"],
+        force_refresh=force_refresh,
+        offline=offline,
+        **load_arguments(spec),
+    )
+
+    # Map the dataset's columns to the star schema dimensions, mapping codes
+    # to names on the categories
+    facts = pd.DataFrame(
+        {
+            column: melted_df[source].map(
+                lambda code, dictionary=dictionary: dictionary.get(code, code)
+            )
+            if dictionary is not None
+            else melted_df[source]
+            for column, (source, dictionary) in spec["dimensions"].items()
+        }
+    )
+    facts["year"] = melted_df["year"]
+    facts["energy_consumption"] = melted_df[spec["value_name"]]
+    facts = facts.dropna(subset=["energy_consumption"])
+
+    if spec.get("unit"):
+        facts = convert_units(facts, spec["unit"])
+
+    return facts[FACT_COLUMNS].reset_index(drop=True)
+
+
+def process_catalogue_entry(
+    spec, force_refresh, offline, select_model, n_jobs, started, trace_memory
+):
+    # Runs in a worker process: records its stages as part of the parent's
+    # run and returns them with the processed rows
+    reset(started, trace_memory)
+    with stage("process_catalogue_entry", dataset=spec["code"]) as record:
+        if spec.get("impute"):
+            facts = process_and_predict_energy_consumption(
+                force_refresh, offline, select_model, n_jobs, dataset=spec
+            )
+        else:
+            facts = process_dataset(spec, force_refresh, offline)
+        record["rows_out"] = len(facts)
+    return facts, list(STAGES)
+
+
+def process_catalogue(
+    catalogue=CATALOGUE,
+    force_refresh=False,
+    offline=OFFLINE,
+    select_model=False,
+    n_jobs=-1,
+    max_workers=None,
+):
+    """Process every catalogue entry into one DataFrame of star schema rows.
+
+    Each entry is processed in its own worker process (up to ``max_workers``,
+    by default one per entry and at most one per core). Rows are returned in
+    catalogue order; if two entries yield the same natural key, the first
+    entry's row is kept.
+    """
+    max_workers = max_workers or min(len(catalogue), os.cpu_count() or 1)
+    with stage("process_catalogue") as record:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    process_catalogue_entry,
+                    spec,
+                    force_refresh,
+                    offline,
+                    select_model,
+                    n_jobs,
+                    run_started(),
+                    tracing_memory(),
+                )
+                for spec in catalogue
+            ]
+            results = [future.result() for future in futures]
+
+        for _, records in results:
+            STAGES.extend(records)
+
+        # Keep the first row of each natural key, within an entry and then
+        # across entries
+        entries = [facts.drop_duplicates(subset=FACT_KEY) for facts, _ in results]
+        repeated = sum(len(facts) for facts, _ in results) - sum(map(len, entries))
+        if repeated:
+            print(f"Dropped {repeated} rows repeated within a dataset")
+        data_df = pd.concat(entries, ignore_index=True)
+        duplicated = data_df.duplicated(subset=FACT_KEY)
+        if duplicated.any():
+            print(
+                f"Dropped {duplicated.sum()} rows already provided by another dataset"
+            )
+            data_df = data_df[~duplicated].reset_index(drop=True)
+        record["rows_out"] = len(data_df)
+
+    return data_df
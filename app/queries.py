@@ -0,0 +1,165 @@
+from sqlalchemy import func, select
+
+from app.models import (
+    EnergyRecord,
+    Countries,
+    EnergyType,
+    EnergyUseType,
+    NATURAL_KEY,
+    Units,
+)
+
+# Columns returned by the read endpoints, projected straight from the fact
+# table and the four dimension tables so no ORM objects (and no lazy
+# relationship loads) are involved in building a response.
+RECORD_COLUMNS = (
+    EnergyRecord.id,
+    Countries.name.label("countries"),
+    EnergyType.code.label("energy_types"),
+    EnergyUseType.type.label("energy_use_types"),
+    Units.name.label("units"),
+    EnergyRecord.year,
+    EnergyRecord.energy_consumption,
+)
+RECORD_FIELDS = tuple(column.key for column in RECORD_COLUMNS)
+
+
+def record_select():
+    """Single SELECT joining energy_records to its dimension tables."""
+    return (
+        select(*RECORD_COLUMNS)
+        .join(Countries, EnergyRecord.countries_id == Countries.id)
+        .join(EnergyType, EnergyRecord.energy_types_id == EnergyType.id)
+        .join(EnergyUseType, EnergyRecord.energy_use_types_id == EnergyUseType.id)
+        .join(Units, EnergyRecord.units_id == Units.id)
+    )
+
+
+def row_to_dict(row):
+    return dict(zip(RECORD_FIELDS, row))
+
+
+def records_with_keys(session, keys, exclude_ids=()):
+    """Stored records (as dicts of columns) whose natural key is in ``keys``.
+
+    One query filters every key column on the distinct values it takes in
+    ``keys`` (a handful of dimension ids and years), and the candidate rows
+    are matched against ``keys`` in Python. Records whose id is in
+    ``exclude_ids`` are left out.
+    """
+    keys = set(keys)
+    if not keys:
+        return []
+    table = EnergyRecord.__table__
+    stmt = select(table).where(
+        *(
+            table.c[column].in_({key[position] for key in keys})
+            for position, column in enumerate(NATURAL_KEY)
+        )
+    )
+    if exclude_ids:
+        stmt = stmt.where(table.c.id.not_in(exclude_ids))
+    records = (row._asdict() for row in session.execute(stmt))
+    return [
+        record
+        for record in records
+        if tuple(record[column] for column in NATURAL_KEY) in keys
+    ]
+
+
+class AggregationError(ValueError):
+    """Raised when the aggregation query parameters are invalid."""
+
+
+# Dimensions that can be grouped or filtered on: the table to join, the
+# foreign key to join it through and the column exposed in the response.
+DIMENSIONS = {
+    "country": (Countries, EnergyRecord.countries_id, Countries.name),
+    "energy_type": (EnergyType, EnergyRecord.energy_types_id, EnergyType.code),
+    "use_type": (EnergyUseType, EnergyRecord.energy_use_types_id, EnergyUseType.type),
+    "unit": (Units, EnergyRecord.units_id, Units.name),
+}
+DIMENSION_LABELS = {
+    "country": "countries",
+    "energy_type": "energy_types",
+    "use_type": "energy_use_types",
+    "unit": "units",
+    "year": "year",
+}
+AGGREGATES = {
+    "sum": func.sum,
+    "mean": func.avg,
+    "min": func.min,
+    "max": func.max,
+    "count": func.count,
+}
+
+
+def _split(value):
+    return [item for item in value.split(",") if item]
+
+
+def _year(args, name):
+    if name not in args:
+        return None
+    try:
+        return int(args[name])
+    except ValueError:
+        raise AggregationError(f"{name} must be an integer")
+
+
+def parse_aggregate_args(args):
+    """Return ``(group_by, agg, filters, year_from, year_to)`` from the query."""
+    group_by = _split(args.get("group_by", ""))
+    unknown = [name for name in group_by if name not in DIMENSION_LABELS]
+    if unknown:
+        raise AggregationError(
+            f"group_by must be a subset of: {', '.join(DIMENSION_LABELS)}"
+        )
+
+    agg = args.get("agg", "sum")
+    if agg not in AGGREGATES:
+        raise AggregationError(f"agg must be one of: {', '.join(AGGREGATES)}")
+
+    # Dimension filters accept a comma separated list of names
+    filters = {name: _split(args[name]) for name in DIMENSIONS if args.get(name)}
+    if args.get("year"):
+        try:
+            filters["year"] = [int(year) for year in _split(args["year"])]
+        except ValueError:
+            raise AggregationError("year must be a comma separated list of integers")
+
+    return group_by, agg, filters, _year(args, "year_from"), _year(args, "year_to")
+
+
+def aggregate_select(group_by, agg, filters, year_from=None, year_to=None):
+    """GROUP BY query over energy_records, joining only the dimensions used.
+
+    The aggregated value is returned under the ``energy_consumption`` label so
+    clients can use the result in place of the raw records.
+    """
+    used = [name for name in DIMENSIONS if name in group_by or name in filters]
+    group_columns = [
+        (EnergyRecord.year if name == "year" else DIMENSIONS[name][2]).label(
+            DIMENSION_LABELS[name]
+        )
+        for name in group_by
+    ]
+    value = AGGREGATES[agg](EnergyRecord.energy_consumption).label("energy_consumption")
+
+    stmt = select(*group_columns, value).select_from(EnergyRecord)
+    for name in used:
+        table, foreign_key, _ = DIMENSIONS[name]
+        stmt = stmt.join(table, foreign_key == table.id)
+
+    for name, values in filters.items():
+        column = EnergyRecord.year if name == "year" else DIMENSIONS[name][2]
+        stmt = stmt.where(column.in_(values))
+    if year_from is not None:
+        stmt = stmt.where(EnergyRecord.year >= year_from)
+    if year_to is not None:
+        stmt = stmt.where(EnergyRecord.year <= year_to)
+
+    if group_columns:
+        stmt = stmt.group_by(*group_columns).order_by(*group_columns)
+    return stmt
@@ -0,0 +1,112 @@
+import re
+
+from sqlalchemy import text, tuple_
+
+from . import db
+from app.models import EnergyRecord
+from app.pagination import KEYSETS
+from app.queries import record_select
+from app.rollups import ROLLUPS, aggregate_statement
+
+
+# Full scan of a table or index in EXPLAIN QUERY PLAN output
+SCAN = re.compile(r"^SCAN (TABLE )?(\w+)")
+
+# Rollup tables hold one row per group of the queries they answer, so an
+# unfiltered aggregate reads all of them
+ROLLUP_TABLES = {model.__tablename__ for model, _ in ROLLUPS}
+
+
+def api_queries():
+    """Representative statements for the API's filtered and grouped reads.
+
+    Full, unfiltered exports ordered by id are left out: they read every row
+    by definition and SQLite serves them from the table's rowid order.
+    """
+    country_year = KEYSETS["country_year"]
+    return {
+        "detail": record_select().where(EnergyRecord.id == 1),
+        "page by id": record_select()
+        .where(EnergyRecord.id > 1)
+        .order_by(EnergyRecord.id)
+        .limit(100),
+        "page by country and year": record_select()
+        .add_columns(*country_year)
+        .where(tuple_(*country_year) > tuple_(1, 2012, 1))
+        .order_by(*country_year)
+        .limit(100),
+        "duplicate check": EnergyRecord.query.filter_by(
+            countries_id=1,
+            energy_types_id=1,
+            energy_use_types_id=1,
+            units_id=1,
+            year=2012,
+        ).statement,
+        # Aggregates as the endpoint runs them: the sums, counts and means of
+        # the dashboard from the rollup tables, the others from energy_records
+        "aggregate by use type": aggregate_statement(["use_type"], "sum", {}),
+        "aggregate by country": aggregate_statement(["country"], "sum", {}),
+        "aggregate by country and use type": aggregate_statement(
+            ["country", "use_type"], "sum", {}
+        ),
+        "aggregate by country and year": aggregate_statement(
+            ["country", "year"], "sum", {}
+        ),
+        "aggregate for a country": aggregate_statement(
+            ["year"], "sum", {"country": ["Austria"]}
+        ),
+        "aggregate for a use type": aggregate_statement(
+            ["country"], "mean", {"use_type": ["h_cooking"]}
+        ),
+        "aggregate for a year range": aggregate_statement(
+            ["country"], "sum", {}, year_from=2015, year_to=2018
+        ),
+        "maximum by country and year": aggregate_statement(
+            ["country", "year"], "max", {}
+        ),
+        "minimum for a use type": aggregate_statement(
+            ["country"], "min", {"use_type": ["h_cooking"]}
+        ),
+        "aggregate for energy type and unit": aggregate_statement(
+            ["year"], "sum", {"energy_type": ["TOTAL"], "unit": ["TJ"]}
+        ),
+    }
+
+
+def explain(statement):
+    """Return the EXPLAIN QUERY PLAN detail lines of ``statement``."""
+    compiled = statement.compile(
+        dialect=db.engine.dialect, compile_kwargs={"literal_binds": True}
+    )
+    rows = db.session.execute(text(f"EXPLAIN QUERY PLAN {compiled}"))
+    return [row.detail for row in rows]
+
+
+def plan_problems(plan):
+    """Lines of a query plan that scan a table.
+
+    A full scan of a table (``SCAN t``, or ``SCAN TABLE t`` in older SQLite
+    versions), or of a non-covering index, visits every table row. A scan of
+    a covering index is accepted, as it never touches the table rows, and so
+    is a scan of a rollup table.
+    """
+    problems = []
+    for line in plan:
+        scan = SCAN.match(line)
+        if (
+            scan
+            and "USING COVERING INDEX" not in line
+            and scan.group(2) not in ROLLUP_TABLES
+        ):
+            problems.append(line)
+    return problems
+
+
+def inefficient_plans():
+    """Map each API query that scans a table to its plan."""
+    plans = {}
+    for name, statement in api_queries().items():
+        plan = explain(statement)
+        if plan_problems(plan):
+            plans[name] = plan
+    return plans
@@ -0,0 +1,146 @@
+import functools
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from flask import Response, current_app, request
+
+
+class LRUCache:
+    """Thread-safe in-process cache with LRU eviction and a TTL.
+
+    Keeps at most ``max_entries`` entries, each for ``ttl`` seconds. Any
+    object with the same ``get``/``set``/``clear`` methods (e.g. a wrapper
+    around a cache server shared by several API processes) can be used as
+    the response cache backend instead.
+    """
+
+    def __init__(self, max_entries=256, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def init_response_cache(app, backend=None):
+    # Register the response cache backend, by default an in-process LRU cache
+    # configured by RESPONSE_CACHE_MAX_ENTRIES and RESPONSE_CACHE_TTL
+    if backend is None:
+        backend = LRUCache(
+            app.config.get("RESPONSE_CACHE_MAX_ENTRIES", 256),
+            app.config.get("RESPONSE_CACHE_TTL", 300),
+        )
+    app.extensions["response_cache"] = backend
+
+    # Processes serving the same database (multi-worker WSGI servers) tell
+    # each other about writes through a generation token in a shared file
+    app.config.setdefault(
+        "RESPONSE_CACHE_GENERATION_FILE",
+        os.path.join(app.instance_path, "response_cache.generation"),
+    )
+    app.extensions["response_cache_generation"] = {"seen": None}
+
+
+def read_generation():
+    # Generation token of the last write signalled to every process
+    try:
+        with open(current_app.config["RESPONSE_CACHE_GENERATION_FILE"]) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _check_generation():
+    # Drop this process's cached responses if another process wrote since
+    state = current_app.extensions["response_cache_generation"]
+    generation = read_generation()
+    if generation != state["seen"]:
+        current_app.extensions["response_cache"].clear()
+        state["seen"] = generation
+
+
+def invalidate_responses():
+    # Drop every cached response; called by the handlers after a write
+    current_app.extensions["response_cache"].clear()
+
+    generation = uuid.uuid4().hex
+    path = current_app.config["RESPONSE_CACHE_GENERATION_FILE"]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(generation)
+    current_app.extensions["response_cache_generation"]["seen"] = generation
+
+
+def cached_response(view):
+    """Serve GET requests of ``view`` from the response cache.
+
+    Responses are keyed on path and query string (and the Accept header,
+    which selects the export format) and carry an ETag, so a client sending
+    it back in If-None-Match gets a 304 without a body. Only complete 200
+    responses are cached; streamed exports are passed through. Entries are
+    tagged with the write generation they were computed in and only served
+    in that generation.
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != "GET":
+            return view(*args, **kwargs)
+
+        _check_generation()
+        state = current_app.extensions["response_cache_generation"]
+        generation = state["seen"]
+        cache = current_app.extensions["response_cache"]
+        key = f"{request.full_path}|{request.headers.get('Accept', '')}"
+        entry = cache.get(key)
+        if entry is not None and entry["generation"] != generation:
+            entry = None
+        if entry is None:
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed:
+                return response
+            body = response.get_data()
+            entry = {
+                "body": body,
+                "mimetype": response.mimetype,
+                "etag": hashlib.sha1(body).hexdigest(),
+                "generation": generation,
+            }
+            # A write while the view ran (in another thread) may have
+            # invalidated the data it read, so the response isn't cached
+            if state["seen"] == generation and read_generation() == generation:
+                cache.set(key, entry)
+
+        response = Response(entry["body"], mimetype=entry["mimetype"])
+        response.set_etag(entry["etag"])
+        # Clients may keep the response but must revalidate it with the ETag
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+    return wrapper
@@ -0,0 +1,200 @@
+from collections import defaultdict
+
+from sqlalchemy import delete, func, insert, select
+
+from . import db
+from app.database import dialect_insert
+from app.models import (
+    CountryUseTypeRollup,
+    CountryYearRollup,
+    EnergyRecord,
+    NATURAL_KEY,
+    UseTypeYearRollup,
+)
+from app.queries import (
+    DIMENSIONS,
+    DIMENSION_LABELS,
+    aggregate_select,
+    records_with_keys,
+)
+
+# Rollup tables with the aggregate endpoint dimensions they are keyed on,
+# smallest first so a query is answered from the fewest rows
+ROLLUPS = [
+    (UseTypeYearRollup, ("use_type", "year")),
+    (CountryYearRollup, ("country", "year")),
+    (CountryUseTypeRollup, ("country", "use_type")),
+]
+
+# energy_records (and rollup) column of each dimension
+ROLLUP_KEYS = {
+    "country": "countries_id",
+    "use_type": "energy_use_types_id",
+    "year": "year",
+}
+
+
+def _key_columns(model):
+    return [column.name for column in model.__table__.primary_key]
+
+
+def _aggregates(model):
+    # Aggregates computable from the sums and counts, in the labels of the
+    # aggregate endpoint
+    total = func.sum(model.energy_consumption_sum)
+    count = func.sum(model.record_count)
+    return {
+        "sum": total,
+        "count": func.coalesce(count, 0),
+        "mean": total / count,
+    }
+
+
+def record_values(record):
+    # Column values of an EnergyRecord instance as a dict
+    return {
+        column.key: getattr(record, column.key)
+        for column in EnergyRecord.__table__.columns
+    }
+
+
+def apply_rollup_changes(session, added=(), removed=()):
+    """Add the records ``added`` to the rollups and take ``removed`` out.
+
+    Records are mappings of energy_records columns. The changes are summed
+    per group in Python and written with one upsert per rollup table, in the
+    session's transaction, so a rolled back write leaves the rollups alone.
+    An update is the old record removed and the new one added.
+    """
+    added, removed = list(added), list(removed)
+    for model, _ in ROLLUPS:
+        table = model.__table__
+        keys = _key_columns(model)
+        deltas = defaultdict(lambda: [0.0, 0])
+        for records, sign in ((added, 1), (removed, -1)):
+            for record in records:
+                delta = deltas[tuple(record[key] for key in keys)]
+                delta[0] += sign * record["energy_consumption"]
+                delta[1] += sign
+
+        rows = [
+            {
+                **dict(zip(keys, key)),
+                "energy_consumption_sum": total,
+                "record_count": count,
+            }
+            for key, (total, count) in deltas.items()
+            if total or count
+        ]
+        if not rows:
+            continue
+        stmt = dialect_insert(session, table)
+        session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=keys,
+                set_={
+                    "energy_consumption_sum": table.c.energy_consumption_sum
+                    + stmt.excluded.energy_consumption_sum,
+                    "record_count": table.c.record_count + stmt.excluded.record_count,
+                },
+            ),
+            rows,
+        )
+        if removed:
+            # Groups whose last record was removed
+            session.execute(delete(table).where(table.c.record_count <= 0))
+
+
+def stored_records(session, rows):
+    # Records currently stored under the natural keys of ``rows``, to take
+    # their old values out of the rollups before an upsert
+    keys = {tuple(row[column] for column in NATURAL_KEY) for row in rows}
+    return records_with_keys(session, keys)
+
+
+def rebuild_rollups(session=None):
+    """Recompute every rollup table from energy_records.
+
+    Returns the number of groups per rollup table. Use it after writes that
+    bypass the API and the loader, or to clear rounding drift of the sums.
+    """
+    session = session or db.session
+    groups = {}
+    for model, _ in ROLLUPS:
+        table = model.__table__
+        keys = _key_columns(model)
+        session.execute(delete(table))
+        source = select(
+            *(EnergyRecord.__table__.c[key] for key in keys),
+            func.sum(EnergyRecord.energy_consumption),
+            func.count(),
+        ).group_by(*(EnergyRecord.__table__.c[key] for key in keys))
+        session.execute(
+            insert(table).from_select(
+                [*keys, "energy_consumption_sum", "record_count"], source
+            )
+        )
+        groups[table.name] = session.execute(
+            select(func.count()).select_from(table)
+        ).scalar()
+    session.commit()
+    return groups
+
+
+def rollup_select(group_by, agg, filters, year_from=None, year_to=None):
+    """Rollup table counterpart of ``aggregate_select``, or None.
+
+    The query is answered from the smallest rollup keyed on every dimension
+    it groups or filters by, reading one row per group. Queries on the
+    energy type or unit, and min/max (which can't be maintained under
+    deletes), return None and are answered from energy_records.
+    """
+    used = set(group_by) | set(filters)
+    if year_from is not None or year_to is not None:
+        used.add("year")
+    for model, dimensions in ROLLUPS:
+        if used <= set(dimensions):
+            break
+    else:
+        return None
+    aggregates = _aggregates(model)
+    if agg not in aggregates:
+        return None
+
+    def key_column(name):
+        return getattr(model, ROLLUP_KEYS[name])
+
+    group_columns = [
+        (key_column(name) if name == "year" else DIMENSIONS[name][2]).label(
+            DIMENSION_LABELS[name]
+        )
+        for name in group_by
+    ]
+    value = aggregates[agg].label("energy_consumption")
+
+    stmt = select(*group_columns, value).select_from(model)
+    for name in DIMENSIONS:
+        if name in group_by or name in filters:
+            table = DIMENSIONS[name][0]
+            stmt = stmt.join(table, key_column(name) == table.id)
+
+    for name, values in filters.items():
+        column = key_column(name) if name == "year" else DIMENSIONS[name][2]
+        stmt = stmt.where(column.in_(values))
+    if year_from is not None:
+        stmt = stmt.where(key_column("year") >= year_from)
+    if year_to is not None:
+        stmt = stmt.where(key_column("year") <= year_to)
+
+    if group_columns:
+        stmt = stmt.group_by(*group_columns).order_by(*group_columns)
+    return stmt
+
+
+def aggregate_statement(group_by, agg, filters, year_from=None, year_to=None):
+    # Query of the aggregate endpoint: from a rollup table when one covers
+    # it, otherwise from energy_records
+    stmt = rollup_select(group_by, agg, filters, year_from, year_to)
+    if stmt is None:
+        stmt = aggregate_select(group_by, agg, filters, year_from, year_to)
+    return stmt
@@ -1,12 +1,7 @@
 from marshmallow import Schema, fields, validate, ValidationError
 from marshmallow import validates_schema
-from app.models import (
-    EnergyRecord,
-    Countries,
-    EnergyType,
-    EnergyUseType,
-    Units,
-)
+from app.dimension_cache import RECORD_DIMENSIONS, dimension_cache
+from app.models import EnergyRecord
 
 
 class EnergyRecordSchema(Schema):
@@ -45,31 +40,28 @@ class EnergyRecordSchema(Schema):
 
     @validates_schema(skip_on_field_errors=True)
     def validate_unique(self, data, **kwargs):
-        # Retrieve related instances from the database
-        countries = Countries.query.filter_by(name=data["countries"]).first()
-        energy_types = EnergyType.query.filter_by(code=data["energy_types"]).first()
-        energy_use_types = EnergyUseType.query.filter_by(
-            type=data["energy_use_types"]
-        ).first()
-        units = Units.query.filter_by(name=data["units"]).first()
+        # Partial updates are checked by the natural-key index on commit, and
+        # batches with one set-based query for all their records
+        natural_key = ["countries", "energy_types", "energy_use_types", "units"]
+        if self.context.get("batch") or any(
+            field not in data for field in natural_key + ["year"]
+        ):
+            return
 
-        # Check for duplicate records in the database only on POST
-        existing_record = EnergyRecord.query.filter_by(
-            countries=countries,
-            energy_types=energy_types,
-            energy_use_types=energy_use_types,
-            units=units,
-            year=data["year"],
-            energy_consumption=data["energy_consumption"],
-        ).first()
+        # Dimension ids from the in-memory lookup; a record naming an unknown
+        # value cannot be a duplicate (the handlers report the unknown value)
+        foreign_keys = {}
+        for field, (_, foreign_key, _) in RECORD_DIMENSIONS.items():
+            foreign_keys[foreign_key] = dimension_cache().id(field, data[field])
+            if foreign_keys[foreign_key] is None:
+                return
+
+        # A record with the same country, energy type, use type, unit and year
+        # already exists (other than the one being updated by a PUT)
+        query = EnergyRecord.query.filter_by(**foreign_keys, year=data["year"])
+        if self.context.get("record_id") is not None:
+            query = query.filter(EnergyRecord.id != self.context["record_id"])
+        existing_record = query.first()
 
         if existing_record:
             raise ValidationError("Duplicate record")
-
-    @validates_schema(skip_on_field_errors=True)
-    def validate_existing_record(self, data, **kwargs):
-        # This validation applies only for PUT requests
-        if self.context.get("put_request"):
-            print("Validating existing record for PUT request.")
-        else:
-            print("Validation skipped for non-PUT request.")
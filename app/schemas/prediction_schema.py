@@ -0,0 +1,25 @@
+from marshmallow import Schema, fields, validate
+
+
+class PredictionSchema(Schema):
+    countries = fields.String(
+        required=True, error_messages={"required": "countries is required"}
+    )
+    energy_use_types = fields.String(
+        required=True, error_messages={"required": "energy_use_types is required"}
+    )
+    number_of_households = fields.Float(
+        required=True,
+        validate=validate.Range(min=0),
+        error_messages={
+            "required": "number_of_households is required",
+            "invalid": "number_of_households must be a float",
+        },
+    )
+    year = fields.Integer(
+        required=True,
+        error_messages={
+            "required": "year is required",
+            "invalid": "year must be an integer",
+        },
+    )
@@ -0,0 +1,29 @@
+from flask import has_request_context, request
+from flask_sqlalchemy.session import Session
+
+# Bind key of the read-only engine (SQLALCHEMY_BINDS) and the HTTP methods
+# whose queries it serves
+READER_BIND = "reader"
+READ_METHODS = ("GET", "HEAD")
+
+
+class RoutingSession(Session):
+    """Session sending the queries of GET requests to the read-only engine.
+
+    Everything else (writes, flushes, the queries of POST/PUT/DELETE handlers
+    and CLI commands) uses the default engine, so a write request always
+    reads its own data. Without a ``reader`` bind all queries use the default
+    engine.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and has_request_context()
+            and request.method in READ_METHODS
+        ):
+            reader = self._db.engines.get(READER_BIND)
+            if reader is not None:
+                return reader
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
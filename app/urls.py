@@ -1,16 +1,46 @@
-from flask import Blueprint, request, jsonify
+import pandas as pd
+from flask import Blueprint, current_app, request, jsonify
 from marshmallow import ValidationError
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
 from . import db
 from app.schemas.energy_record_schema import EnergyRecordSchema
-from app.models import (
-    EnergyRecord,
-    Countries,
-    EnergyType,
-    EnergyUseType,
-    Units,
+from app.schemas.prediction_schema import PredictionSchema
+from app.imputation_model import predict_consumption
+from app.exports import (
+    COLUMNAR_FORMATS,
+    EXPORT_FORMATS,
+    PYARROW_AVAILABLE,
+    arrow_response,
+    ndjson_response,
+    parquet_response,
+    requested_format,
 )
+from app.dimension_cache import RECORD_DIMENSIONS, dimension_cache
+from app.batch import (
+    BatchError,
+    add_error,
+    batch_items,
+    flag_duplicates,
+    is_record_id,
+    load_items,
+    natural_key,
+    resolve_dimensions,
+)
+from app.response_cache import cached_response, invalidate_responses
+from app.rollups import aggregate_statement, apply_rollup_changes, record_values
+from app.pagination import PaginationError, parse_page_args, keyset_page
+from app.queries import (
+    AggregationError,
+    parse_aggregate_args,
+    record_select,
+    row_to_dict,
+)
+from app.models import EnergyRecord
 
 energy_record_schema = EnergyRecordSchema()
+batch_schema = EnergyRecordSchema(context={"batch": True})
+prediction_schema = PredictionSchema(many=True)
 api_blueprint = Blueprint("api", __name__)
 
 
@@ -21,22 +51,50 @@ def root():
 
 
 @api_blueprint.route("/energy_records/", methods=["GET", "POST"])
+@cached_response
 def energy_records():
     if request.method == "GET":
-        # Return all energy records
-        records = EnergyRecord.query.all()
-        records_data = [
-            {
-                "id": record.id,
-                "countries": record.countries.name,
-                "energy_types": record.energy_types.code,
-                "energy_use_types": record.energy_use_types.type,
-                "units": record.units.name,
-                "year": record.year,
-                "energy_consumption": record.energy_consumption,
-            }
-            for record in records
-        ]
+        fmt = requested_format(request)
+        if fmt is None:
+            return (
+                jsonify(
+                    {"error": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}
+                ),
+                400,
+            )
+
+        # Full export streamed as newline-delimited JSON
+        if fmt == "ndjson":
+            return ndjson_response(record_select().order_by(EnergyRecord.id))
+
+        # Columnar exports with dictionary-encoded dimension columns
+        if fmt in COLUMNAR_FORMATS:
+            if not PYARROW_AVAILABLE:
+                return jsonify({"error": f"{fmt} export requires pyarrow"}), 406
+            if fmt == "arrow":
+                return arrow_response()
+            return parquet_response()
+
+        # Keyset pagination when the client asks for a page
+        if "limit" in request.args or "after" in request.args:
+            try:
+                order, after_values, limit = parse_page_args(request.args)
+            except PaginationError as e:
+                return jsonify({"error": str(e)}), 400
+
+            rows, next_cursor = keyset_page(
+                db.session, record_select(), order, after_values, limit
+            )
+            return jsonify(
+                {
+                    "records": [row_to_dict(row) for row in rows],
+                    "next_cursor": next_cursor,
+                }
+            )
+
+        # Return all energy records in a single joined query
+        rows = db.session.execute(record_select().order_by(EnergyRecord.id))
+        records_data = [row_to_dict(row) for row in rows]
         return jsonify(records_data)
 
     elif request.method == "POST":
@@ -45,57 +103,209 @@ def energy_records():
             # Validate the incoming JSON data with the Marshmallow schema
             validated_data = energy_record_schema.load(data)
 
-            # If the data is valid, proceed to fetch related instances
-            countries = Countries.query.filter_by(
-                name=validated_data["countries"]
-            ).first()
-            energy_types = EnergyType.query.filter_by(
-                code=validated_data["energy_types"]
-            ).first()
-            energy_use_types = EnergyUseType.query.filter_by(
-                type=validated_data["energy_use_types"]
-            ).first()
-            units = Units.query.filter_by(name=validated_data["units"]).first()
+            # Foreign keys from the in-memory dimension lookup
+            foreign_keys = {}
+            for field, (_, foreign_key, label) in RECORD_DIMENSIONS.items():
+                foreign_keys[foreign_key] = dimension_cache().id(
+                    field, validated_data[field]
+                )
+                if foreign_keys[foreign_key] is None:
+                    return (
+                        jsonify(
+                            {"error": f"{label} {validated_data[field]} not found!"}
+                        ),
+                        404,
+                    )
 
-            validated_data = energy_record_schema.load(data)
             new_record = EnergyRecord(
-                countries=countries,
-                energy_types=energy_types,
-                energy_use_types=energy_use_types,
-                units=units,
+                **foreign_keys,
                 year=validated_data["year"],
                 energy_consumption=validated_data["energy_consumption"],
             )
 
             db.session.add(new_record)
+            apply_rollup_changes(db.session, added=[record_values(new_record)])
             db.session.commit()
+            invalidate_responses()
             return jsonify({"message": "New energy record added successfully!"}), 201
 
         except ValidationError as e:
             # Return the validation errors from Marshmallow
             return jsonify({"error": "Validation error", "messages": e.messages}), 400
+        except IntegrityError:
+            # A concurrent write inserted the same natural key first
+            db.session.rollback()
+            return jsonify({"error": "Duplicate record"}), 409
+
+
+@api_blueprint.route("/energy_records/batch", methods=["POST", "PUT", "DELETE"])
+def energy_records_batch():
+    # Create (POST a list of records), update (PUT a list of records with
+    # their id) or delete (DELETE {"ids": [...]}) many records at once. Every
+    # item is validated first and errors are reported per item index; the
+    # batch is only written, in one transaction, if all items are valid.
+    data = request.get_json()
+    table = EnergyRecord.__table__
+    errors = {}
+    try:
+        if request.method == "DELETE":
+            ids = batch_items(
+                data.get("ids") if isinstance(data, dict) else None, "ids"
+            )
+        else:
+            items = batch_items(data)
+    except BatchError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if request.method == "POST":
+        loaded = load_items(batch_schema, dict(enumerate(items)), errors)
+        records = resolve_dimensions(loaded, errors)
+        flag_duplicates(
+            {index: natural_key(record) for index, record in records.items()}, errors
+        )
+        if errors:
+            return jsonify({"error": "Validation error", "messages": errors}), 400
+
+        try:
+            rows = [records[index] for index in sorted(records)]
+            db.session.execute(insert(table), rows)
+            apply_rollup_changes(db.session, added=rows)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({"error": "Duplicate record"}), 409
+        invalidate_responses()
+        return (
+            jsonify({"message": f"{len(records)} energy records added successfully!"}),
+            201,
+        )
+
+    elif request.method == "PUT":
+        # Split each item into the record id and the fields to update
+        record_ids, changes, seen = {}, {}, set()
+        for index, item in enumerate(items):
+            record_id = item.get("id") if isinstance(item, dict) else None
+            if not is_record_id(record_id):
+                add_error(errors, index, "id", "id must be an integer")
+            elif record_id in seen:
+                add_error(errors, index, "id", "Duplicate id in batch")
+            elif len(item) == 1:
+                add_error(errors, index, "_schema", "No fields to update")
+            else:
+                seen.add(record_id)
+                record_ids[index] = record_id
+                changes[index] = {k: v for k, v in item.items() if k != "id"}
+
+        # Current values of all the records, in one query
+        current = {
+            row.id: row._asdict()
+            for row in db.session.execute(
+                select(table).where(table.c.id.in_(list(record_ids.values())))
+            )
+        }
+        for index, record_id in record_ids.items():
+            if record_id not in current:
+                add_error(errors, index, "id", f"Energy Record {record_id} not found!")
+                del changes[index]
+
+        loaded = load_items(batch_schema, changes, errors, partial=True)
+        updates = resolve_dimensions(loaded, errors)
+        flag_duplicates(
+            {
+                index: natural_key({**current[record_ids[index]], **update})
+                for index, update in updates.items()
+            },
+            errors,
+            exclude_ids=list(record_ids.values()),
+        )
+        if errors:
+            return jsonify({"error": "Validation error", "messages": errors}), 400
+
+        try:
+            db.session.execute(
+                update(EnergyRecord),
+                [
+                    {"id": record_ids[index], **update}
+                    for index, update in updates.items()
+                ],
+            )
+            old = [current[record_ids[index]] for index in updates]
+            apply_rollup_changes(
+                db.session,
+                added=[
+                    {**record, **updates[index]} for index, record in zip(updates, old)
+                ],
+                removed=old,
+            )
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({"error": "Duplicate record"}), 409
+        invalidate_responses()
+        return (
+            jsonify(
+                {"message": f"{len(updates)} energy records updated successfully!"}
+            ),
+            200,
+        )
+
+    elif request.method == "DELETE":
+        for index, record_id in enumerate(ids):
+            if not is_record_id(record_id):
+                add_error(errors, index, "id", "id must be an integer")
+        if errors:
+            return jsonify({"error": "Validation error", "messages": errors}), 400
+
+        found = {
+            row.id: row._asdict()
+            for row in db.session.execute(select(table).where(table.c.id.in_(ids)))
+        }
+        for index, record_id in enumerate(ids):
+            if record_id not in found:
+                add_error(errors, index, "id", f"Energy Record {record_id} not found!")
+        if errors:
+            return jsonify({"error": "Validation error", "messages": errors}), 400
+
+        db.session.execute(delete(table).where(table.c.id.in_(ids)))
+        apply_rollup_changes(db.session, removed=found.values())
+        db.session.commit()
+        invalidate_responses()
+        return (
+            jsonify({"message": f"{len(found)} energy records deleted successfully!"}),
+            200,
+        )
+
+
+@api_blueprint.route("/energy_records/aggregate", methods=["GET"])
+@cached_response
+def energy_records_aggregate():
+    # Group and aggregate energy consumption in SQL, e.g.
+    # ?group_by=country,year&agg=sum&use_type=h_cooking&year_from=2015
+    try:
+        group_by, agg, filters, year_from, year_to = parse_aggregate_args(request.args)
+    except AggregationError as e:
+        return jsonify({"error": str(e)}), 400
+
+    result = db.session.execute(
+        aggregate_statement(group_by, agg, filters, year_from, year_to)
+    )
+    return jsonify([dict(row._mapping) for row in result])
 
 
 @api_blueprint.route(
     "/energy_record_detail/<int:record_id>", methods=["GET", "PUT", "DELETE"]
 )
+@cached_response
 def energy_record_detail(record_id):
     if request.method == "GET":
         # Return a specific energy record
-        record = EnergyRecord.query.get(record_id)
-        if not record:
+        row = db.session.execute(
+            record_select().where(EnergyRecord.id == record_id)
+        ).first()
+        if not row:
             return jsonify({"error": "Energy Record not found!"}), 404
 
-        record_data = {
-            "id": record.id,
-            "countries": record.countries.name,
-            "energy_types": record.energy_types.code,
-            "energy_use_types": record.energy_use_types.type,
-            "units": record.units.name,
-            "year": record.year,
-            "energy_consumption": record.energy_consumption,
-        }
-        return jsonify(record_data), 200
+        return jsonify(row_to_dict(row)), 200
 
     elif request.method == "PUT":
         data = request.get_json()
@@ -103,51 +313,35 @@ def energy_record_detail(record_id):
         if not record:
             return jsonify({"error": "Energy Record not found!"}), 404
 
-        energy_record_schema.context["put_request"] = True
+        # Per-request schema so the PUT context doesn't leak into other requests
+        put_schema = EnergyRecordSchema(context={"record_id": record_id})
 
         try:
-            validated_data = energy_record_schema.load(data, partial=True)
+            validated_data = put_schema.load(data, partial=True)
+            old = record_values(record)
             for key, value in validated_data.items():
-                if key == "countries":
-                    country_instance = Countries.query.filter_by(name=value).first()
-                    if not country_instance:
-                        return (
-                            jsonify({"error": f"Country name {value} not found!"}),
-                            404,
-                        )
-                    record.countries = country_instance
-                elif key == "energy_types":
-                    energy_type_instance = EnergyType.query.filter_by(
-                        code=value
-                    ).first()
-                    if not energy_type_instance:
-                        return (
-                            jsonify({"error": f"Energy type code {value} not found!"}),
-                            404,
-                        )
-                    record.energy_types = energy_type_instance
-                elif key == "energy_use_types":
-                    energy_use_type_instance = EnergyUseType.query.filter_by(
-                        type=value
-                    ).first()
-                    if not energy_use_type_instance:
-                        return (
-                            jsonify({"error": f"Energy use type {value} not found!"}),
-                            404,
-                        )
-                    record.energy_use_types = energy_use_type_instance
-                elif key == "units":
-                    unit_instance = Units.query.filter_by(name=value).first()
-                    if not unit_instance:
-                        return jsonify({"error": f"Unit name {value} not found!"}), 404
-                    record.units = unit_instance
+                if key in RECORD_DIMENSIONS:
+                    # Foreign key from the in-memory dimension lookup
+                    _, foreign_key, label = RECORD_DIMENSIONS[key]
+                    dimension_id = dimension_cache().id(key, value)
+                    if dimension_id is None:
+                        return jsonify({"error": f"{label} {value} not found!"}), 404
+                    setattr(record, foreign_key, dimension_id)
                 else:
                     setattr(record, key, value)
 
+            apply_rollup_changes(
+                db.session, added=[record_values(record)], removed=[old]
+            )
             db.session.commit()
+            invalidate_responses()
             return jsonify({"message": "Energy Record updated successfully!"}), 200
         except ValidationError as e:
             return jsonify({"error": "Validation error", "messages": e.messages}), 400
+        except IntegrityError:
+            # The update would give the record the natural key of another one
+            db.session.rollback()
+            return jsonify({"error": "Duplicate record"}), 409
 
     elif request.method == "DELETE":
         # Delete an existing energy record
@@ -156,5 +350,46 @@ def energy_record_detail(record_id):
             return jsonify({"error": "Energy Record not found!"}), 404
 
         db.session.delete(record)
+        apply_rollup_changes(db.session, removed=[record_values(record)])
         db.session.commit()
+        invalidate_responses()
         return jsonify({"message": "Energy Record deleted successfully!"}), 200
+
+
+@api_blueprint.route("/predict", methods=["POST"])
+def predict():
+    # Impute energy consumption for a batch of
+    # {countries, energy_use_types, number_of_households, year} rows
+    artifact = current_app.extensions.get("imputation_model")
+    if artifact is None:
+        return jsonify({"error": "No trained imputation model available"}), 503
+
+    data = request.get_json()
+    if isinstance(data, dict):
+        data = [data]
+    try:
+        rows = prediction_schema.load(data)
+    except ValidationError as e:
+        return jsonify({"error": "Validation error", "messages": e.messages}), 400
+
+    features_df = pd.DataFrame(rows, columns=list(PredictionSchema().fields)).rename(
+        columns={"countries": "country"}
+    )
+
+    # The model can only encode the categories it was trained with
+    preprocessors = artifact["preprocessors"]
+    messages = {}
+    for field, column, encoder in [
+        ("countries", "country", preprocessors["country_encoder"]),
+        ("energy_use_types", "energy_use_types", preprocessors["use_type_encoder"]),
+    ]:
+        unknown = ~features_df[column].isin(encoder.classes_)
+        for index in features_df.index[unknown]:
+            messages.setdefault(index, {})[field] = [
+                f"Unknown {field} {features_df.at[index, column]}"
+            ]
+    if messages:
+        return jsonify({"error": "Validation error", "messages": messages}), 400
+
+    predictions = predict_consumption(artifact, features_df)
+    return jsonify({"predictions": predictions.tolist()}), 200
@@ -0,0 +1,200 @@
+# benchmark_processing.py
+"""Benchmark of the Eurostat processing stage: filter, melt, merge and rename.
+
+Runs on synthetic frames sized like the full nrg_d_hhq and lfst_hhnhtych
+extracts and compares two ways of handling the dimension columns:
+
+- before: plain object columns, filtered with one str.contains pass per
+  column and mapped with Series.replace;
+- after: Categorical columns, filtered and mapped on their categories.
+
+Reports the wall time, peak traced memory and size of the processed frame of
+each, and checks that both produce the same rows.
+
+Run with: python benchmarks/benchmark_processing.py
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from notebooks.eurostat_dictionary import country_dictionary, energy_types_dict
+from dataset_catalogue import HOUSEHOLD_ENERGY
+from process_energy_data import (
+    align_categories,
+    filter_data,
+    melt_and_sort,
+    rename_columns,
+    to_categorical,
+    year_columns,
+)
+
+ENERGY_ID_VARS = ["freq", "nrg_bal", "siec", "unit", "geo\\TIME_PERIOD"]
+HOUSEHOLD_ID_VARS = [
+    "freq",
+    "agechild",
+    "n_child",
+    "hhcomp",
+    "unit",
+    "geo\\TIME_PERIOD",
+]
+COMMON_COLS = ["freq", "geo\\TIME_PERIOD", "year"]
+YEARS = [str(year) for year in range(1990, 2023)]
+
+
+def synthetic_frame(dimensions, id_vars, rng):
+    rows = pd.DataFrame(list(itertools.product(*dimensions)), columns=id_vars)
+    values = rng.random((len(rows), len(YEARS))) * 1000
+    values[rng.random(values.shape) < 0.2] = np.nan
+    return pd.concat([rows, pd.DataFrame(values, columns=YEARS)], axis=1)
+
+
+def synthetic_extract(scale, seed=42):
+    rng = np.random.default_rng(seed)
+    geos = list(country_dictionary) + ["EU27_2020", "EA20", "EU28"]
+    nrg_bal = list(energy_types_dict) + [f"FC_OTH_{i}" for i in range(25 * scale)]
+    siec = ["TOTAL"] + [f"S{i:04d}" for i in range(60)]
+    energy_df = synthetic_frame(
+        [["A"], nrg_bal, siec, ["TJ", "KTOE", "GWH"], geos], ENERGY_ID_VARS, rng
+    )
+    household_df = synthetic_frame(
+        [
+            ["A"],
+            ["TOTAL"] + [f"Y{i}" for i in range(7)],
+            ["TOTAL"] + [f"NCH{i}" for i in range(4)],
+            ["TOTAL"] + [f"HH{i}" for i in range(9 * scale)],
+            ["THS", "PC"],
+            geos,
+        ],
+        HOUSEHOLD_ID_VARS,
+        rng,
+    )
+    return energy_df, household_df
+
+
+# Processing stage before the categorical rewrite, kept for comparison
+def legacy_filter(df, total_columns=(), filters=None):
+    for column in total_columns:
+        df = df[df[column].str.contains("TOTAL", case=False)]
+    for column, values in (filters or {}).items():
+        df = df[df[column].isin(values)]
+    return df.reset_index(drop=True)
+
+
+def legacy_rename(df):
+    df.rename(columns={"geo\\TIME_PERIOD": "geo", "siec": "energy_types"}, inplace=True)
+    df["country"] = df["geo"].replace(country_dictionary)
+    df["energy_use_types"] = df["nrg_bal"].replace(energy_types_dict)
+    df.rename(
+        columns={"unit_x": "energy_unit", "unit_y": "household_unit"}, inplace=True
+    )
+    df.drop(columns=["nrg_bal", "geo", "freq"], inplace=True)
+    return df
+
+
+def process_before(energy_df, household_df):
+    energy_df = legacy_filter(energy_df, ["siec"], HOUSEHOLD_ENERGY["filters"])
+    household_df = legacy_filter(household_df, ["agechild", "n_child", "hhcomp"])
+    energy_melted = melt_and_sort(
+        energy_df,
+        ENERGY_ID_VARS,
+        "energy_consumption",
+        COMMON_COLS,
+        year_columns(energy_df, ENERGY_ID_VARS),
+    )
+    household_melted = melt_and_sort(
+        household_df,
+        HOUSEHOLD_ID_VARS,
+        "number_of_households",
+        COMMON_COLS,
+        year_columns(household_df, HOUSEHOLD_ID_VARS),
+    )
+    merged_df = pd.merge(energy_melted, household_melted, on=COMMON_COLS)
+    return legacy_rename(merged_df)
+
+
+def process_after(energy_df, household_df):
+    energy_df = to_categorical(energy_df, ENERGY_ID_VARS)
+    household_df = to_categorical(household_df, HOUSEHOLD_ID_VARS)
+    energy_df = filter_data(energy_df, ["siec"], HOUSEHOLD_ENERGY["filters"])
+    household_df = filter_data(household_df, ["agechild", "n_child", "hhcomp"])
+    energy_melted = melt_and_sort(
+        energy_df,
+        ENERGY_ID_VARS,
+        "energy_consumption",
+        COMMON_COLS,
+        year_columns(energy_df, ENERGY_ID_VARS),
+    )
+    household_melted = melt_and_sort(
+        household_df,
+        HOUSEHOLD_ID_VARS,
+        "number_of_households",
+        COMMON_COLS,
+        year_columns(household_df, HOUSEHOLD_ID_VARS),
+    )
+    energy_melted, household_melted = align_categories(
+        energy_melted, household_melted, COMMON_COLS
+    )
+    merged_df = pd.merge(energy_melted, household_melted, on=COMMON_COLS)
+    return rename_columns(merged_df)
+
+
+def measure(function, energy_df, household_df, repeat):
+    # Each run gets fresh copies, made outside the measured section, since the
+    # processing functions may convert columns of their input in place
+    timings = []
+    for _ in range(repeat):
+        inputs = energy_df.copy(), household_df.copy()
+        started = time.perf_counter()
+        result = function(*inputs)
+        timings.append(time.perf_counter() - started)
+
+    inputs = energy_df.copy(), household_df.copy()
+    tracemalloc.start()
+    function(*inputs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--scale", type=int, default=1, help="size multiplier")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per variant")
+    args = parser.parse_args()
+
+    energy_df, household_df = synthetic_extract(args.scale)
+    print(
+        f"Synthetic extract: nrg_d_hhq {energy_df.shape}, "
+        f"lfst_hhnhtych {household_df.shape}"
+    )
+
+    results = {}
+    for name, function in [("before", process_before), ("after", process_after)]:
+        seconds, peak, result = measure(function, energy_df, household_df, args.repeat)
+        results[name] = result
+        size = result.memory_usage(deep=True).sum()
+        print(
+            f"{name:>6}: {seconds:8.3f} s  peak {peak / 2**20:8.1f} MiB  "
+            f"result {len(result)} rows, {size / 2**20:6.1f} MiB"
+        )
+
+    # Both variants must produce the same rows
+    before = results["before"].astype(str).sort_values(list(results["before"].columns))
+    after = results["after"].astype(str).sort_values(list(results["after"].columns))
+    assert before.reset_index(drop=True).equals(after.reset_index(drop=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# load_test.py
+"""Load test of the API served with 1, 2, 4, ... gunicorn workers.
+
+For each worker count it starts `python run.py --workers N`, sends GET
+requests for record details, keyset pages and filtered aggregates from a pool
+of client threads for a fixed duration, and reports requests per second and
+latency percentiles. The response cache is disabled so every request reaches
+the database (--cached to keep it).
+
+Run with: python benchmarks/load_test.py --workers 1 2 4
+"""
+import argparse
+import itertools
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_until_up(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"API did not start within {timeout}s")
+
+
+def request_urls(api_url, session):
+    # Mix of record details, keyset pages and filtered aggregates, cycled
+    # through by every client
+    page = session.get(f"{api_url}/energy_records/", params={"limit": 200}).json()
+    records = page["records"]
+    urls = [f"{api_url}/energy_record_detail/{record['id']}" for record in records]
+    cursor = page["next_cursor"]
+    for _ in range(10):
+        urls.append(f"{api_url}/energy_records/?limit=100&after={cursor}")
+        cursor = session.get(urls[-1]).json()["next_cursor"]
+    for record in records[:20]:
+        urls.append(
+            f"{api_url}/energy_records/aggregate?group_by=year"
+            f"&country={record['countries']}"
+        )
+    return urls
+
+
+def hammer(urls, duration, clients):
+    # Send requests from `clients` threads for `duration` seconds
+    deadline = time.monotonic() + duration
+
+    def client(offset):
+        session = requests.Session()
+        latencies, errors = [], 0
+        for url in itertools.islice(itertools.cycle(urls), offset, None):
+            if time.monotonic() >= deadline:
+                break
+            started = time.perf_counter()
+            if session.get(url).status_code != 200:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+        return latencies, errors
+
+    with ThreadPoolExecutor(clients) as executor:
+        results = list(executor.map(client, range(0, clients * 7, 7)))
+    latencies = sorted(itertools.chain.from_iterable(r[0] for r in results))
+    return latencies, sum(r[1] for r in results)
+
+
+def run(workers, port, duration, clients, cached):
+    env = dict(os.environ)
+    if not cached:
+        env["RESPONSE_CACHE_MAX_ENTRIES"] = "0"
+    server = subprocess.Popen(
+        [sys.executable, "run.py", "--workers", str(workers)]
+        + ["--bind", f"127.0.0.1:{port}"],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    api_url = f"http://127.0.0.1:{port}/api"
+    try:
+        wait_until_up(f"{api_url}/")
+        urls = request_urls(api_url, requests.Session())
+        # Warm up every worker's connections and dimension cache
+        hammer(urls, 1, clients)
+        latencies, errors = hammer(urls, duration, clients)
+    finally:
+        server.terminate()
+        server.wait()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    print(
+        f"{workers:>3} workers: {len(latencies) / duration:8.1f} req/s  "
+        f"p50 {percentile(0.5):6.1f} ms  p95 {percentile(0.95):6.1f} ms  "
+        f"{errors} errors"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--port", type=int, default=5050)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per run")
+    parser.add_argument("--clients", type=int, default=16, help="client threads")
+    parser.add_argument("--cached", action="store_true", help="keep the response cache")
+    args = parser.parse_args()
+
+    for workers in args.workers:
+        run(workers, args.port, args.duration, args.clients, args.cached)
+
+
+if __name__ == "__main__":
+    main()
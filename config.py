@@ -1,3 +1,73 @@
+import os
+import pathlib
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+# SQLite database shipped with the project, by absolute path
+DEFAULT_DATABASE_URI = "sqlite:///" + os.path.join(
+    BASE_DIR, "instance", "energy_api.db"
+)
+
+
+def engine_options(uri):
+    """SQLAlchemy engine options from the DB_* environment variables.
+
+    - DB_POOL_SIZE / DB_MAX_OVERFLOW: connections kept open / opened on top
+      of them under load (not used for in-memory SQLite, which has a single
+      connection per thread).
+    - DB_POOL_RECYCLE: seconds after which a connection is replaced.
+    - DB_POOL_PRE_PING: test connections before use (on by default).
+    """
+    options = {
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "1").lower()
+        in ("1", "true", "yes"),
+    }
+    if uri not in ("sqlite://", "sqlite:///:memory:"):
+        options["pool_size"] = int(os.environ.get("DB_POOL_SIZE", 5))
+        options["max_overflow"] = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+    return options
+
+
+def read_database_uri(uri):
+    """URI of the read-only engine used by GET requests.
+
+    DATABASE_READ_URL if set (e.g. a replica), otherwise for a SQLite file a
+    read-only URI connection to the same file, which in WAL mode reads the
+    last committed data without waiting for writers. None (every query on
+    the writer) for in-memory SQLite and other databases.
+    """
+    if os.environ.get("DATABASE_READ_URL"):
+        return os.environ["DATABASE_READ_URL"]
+    path = uri[len("sqlite:///") :]
+    if uri.startswith("sqlite:///") and os.path.isabs(path) and "?" not in path:
+        return f"sqlite:///{pathlib.Path(path).as_uri()}?mode=ro&uri=true"
+    return None
+
+
 class Config(object):
-    SQLALCHEMY_DATABASE_URI = "sqlite:///../instance/energy_api.db"
+    SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", DEFAULT_DATABASE_URI)
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Read-only engine for GET requests (see app/session.py)
+    SQLALCHEMY_READ_DATABASE_URI = read_database_uri(SQLALCHEMY_DATABASE_URI)
+    SQLALCHEMY_BINDS = (
+        {"reader": SQLALCHEMY_READ_DATABASE_URI} if SQLALCHEMY_READ_DATABASE_URI else {}
+    )
+
+    # SQLite connection settings, applied to every new connection: WAL
+    # journal so reads don't block on writes, synchronous=NORMAL (safe in WAL
+    # mode), how long a writer waits for a lock and how much of the file is
+    # memory-mapped
+    SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+
+    # In-process cache of GET responses, cleared by every API write
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", 256))
+    RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", 300))  # seconds
+
+    # Seconds before the in-memory dimension name -> id maps are reloaded
+    DIMENSION_CACHE_TTL = int(os.environ.get("DIMENSION_CACHE_TTL", 300))
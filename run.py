@@ -1,6 +1,14 @@
+import argparse
+import os
+import sys
+
 import click
 from flask.cli import with_appcontext
 from app import create_app, db
+from app.dimension_cache import invalidate_dimensions
+from app.migrations import upgrade_db
+from app.query_plans import inefficient_plans
+from app.rollups import rebuild_rollups
 
 app = create_app()
 
@@ -11,10 +19,75 @@ def init_db_command():
     """Clear existing data and create new tables."""
     db.drop_all()
     db.create_all()
+    invalidate_dimensions()
     click.echo("Initialized the database.")
 
 
+@click.command("upgrade-db")
+@with_appcontext
+def upgrade_db_command():
+    """Migrate an existing database to the current models.
+
+    Creates missing tables and indexes, drops superseded indexes and rebuilds
+    the rollup tables from the energy records. Warning: energy records that
+    share a natural key with a newer record are deleted, so the unique
+    natural-key index can be created.
+    """
+    removed = upgrade_db()
+    invalidate_dimensions()
+    if removed:
+        click.echo(f"Removed {removed} duplicated energy records.")
+    click.echo("Upgraded the database.")
+
+
+@click.command("check-query-plans")
+@with_appcontext
+def check_query_plans_command():
+    """Fail if an API query scans a table instead of using an index."""
+    plans = inefficient_plans()
+    for name, plan in plans.items():
+        click.echo(f"{name}:")
+        for line in plan:
+            click.echo(f"    {line}")
+    if plans:
+        raise click.ClickException(f"{len(plans)} API queries scan a table.")
+    click.echo("All API queries are served from indexes.")
+
+
+@click.command("rebuild-rollups")
+@with_appcontext
+def rebuild_rollups_command():
+    """Recompute the rollup tables from the energy records."""
+    for table, groups in rebuild_rollups().items():
+        click.echo(f"{table}: {groups} groups")
+    click.echo("Rebuilt the rollup tables.")
+
+
 app.cli.add_command(init_db_command)
+app.cli.add_command(upgrade_db_command)
+app.cli.add_command(check_query_plans_command)
+app.cli.add_command(rebuild_rollups_command)
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    parser = argparse.ArgumentParser(description="Run the energy records API.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="serve with gunicorn and this many worker processes "
+        "(default: the single-process Flask development server)",
+    )
+    parser.add_argument(
+        "--bind", default="127.0.0.1:5000", help="host:port to serve on"
+    )
+    args = parser.parse_args()
+
+    if args.workers:
+        # Replace this process by gunicorn serving the wsgi.py entry point
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+        command = [sys.executable, "-m", "gunicorn"]
+        command += ["--workers", str(args.workers), "--bind", args.bind, "wsgi:app"]
+        os.execv(sys.executable, command)
+
+    host, _, port = args.bind.rpartition(":")
+    app.run(host=host, port=int(port), debug=os.environ.get("FLASK_DEBUG") == "1")
@@ -3,24 +3,87 @@ import requests
 import pandas as pd
 import plotly.express as px
 
+# pyarrow enables the columnar fast path for loading the records
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
 API_URL = "http://127.0.0.1:5000/api"
+PAGE_SIZE = 5000
+
+
+# Seconds the dashboard reuses fetched data before asking the API again;
+# the cache is also cleared after every add, update or delete
+CACHE_TTL = 300
+
+
+# Fetch all energy records from the API, cached across reruns and sessions
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def fetch_energy_records():
+    # Fast path: Arrow IPC stream read straight into pandas, with the
+    # dimension columns arriving as categoricals
+    if pa is not None:
+        response = requests.get(
+            f"{API_URL}/energy_records/", params={"format": "arrow"}
+        )
+        if response.status_code != 406:  # 406: server has no pyarrow
+            response.raise_for_status()
+            table = pa.ipc.open_stream(response.content).read_all()
+            return table.to_pandas(split_blocks=True, self_destruct=True)
+
+    # Walk the keyset-paginated listing until the server reports no next page
+    records = []
+    params = {"limit": PAGE_SIZE}
+    while True:
+        response = requests.get(f"{API_URL}/energy_records/", params=params)
+        response.raise_for_status()  # Raise an exception for HTTP errors
+        page = response.json()
+        records.extend(page["records"])
+        if not page["next_cursor"]:
+            break
+        params["after"] = page["next_cursor"]
+    return pd.DataFrame(records)
+
+
+# Fetch energy consumption grouped and aggregated by the API, cached per query
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def fetch_aggregated_records(group_by, agg="sum", **filters):
+    params = {"group_by": ",".join(group_by), "agg": agg, **filters}
+    response = requests.get(f"{API_URL}/energy_records/aggregate", params=params)
+    response.raise_for_status()
+    return pd.DataFrame(response.json())
+
+
+def clear_cached_data():
+    # Drop the cached records and aggregates after a write through the API
+    fetch_energy_records.clear()
+    fetch_aggregated_records.clear()
 
 
 # Function to fetch energy records from the API
 def get_energy_records():
     try:
-        response = requests.get(f"{API_URL}/energy_records/")
-        response.raise_for_status()  # Raise an exception for HTTP errors
-        return pd.DataFrame(response.json())
+        return fetch_energy_records()
     except requests.exceptions.RequestException as e:
         st.error(f"Failed to fetch energy records: {e}")
         return pd.DataFrame()
 
 
+# Function to fetch energy consumption grouped and aggregated by the API
+def get_aggregated_records(group_by, agg="sum", **filters):
+    try:
+        return fetch_aggregated_records(tuple(group_by), agg, **filters)
+    except requests.exceptions.RequestException as e:
+        st.error(f"Failed to fetch aggregated energy records: {e}")
+        return pd.DataFrame()
+
+
 def add_new_record(new_record_data):
     try:
         response = requests.post(f"{API_URL}/energy_records/", json=new_record_data)
         response.raise_for_status()
+        clear_cached_data()
         st.success("Record added successfully.")
         # st.json(response.json())
     except requests.exceptions.HTTPError as e:
@@ -29,12 +92,26 @@ def add_new_record(new_record_data):
         st.error(f"Request failed: {e}")
 
 
+# Function to estimate energy consumption with the imputation model
+def predict_consumption(prediction_data):
+    try:
+        response = requests.post(f"{API_URL}/predict", json=[prediction_data])
+        response.raise_for_status()
+        return response.json()["predictions"][0]
+    except requests.exceptions.HTTPError as e:
+        st.error(f"Failed to estimate energy consumption: {e.response.content}")
+    except requests.exceptions.RequestException as e:
+        st.error(f"Request failed: {e}")
+    return None
+
+
 def update_record(record_id, update_record_data):
     try:
         response = requests.put(
             f"{API_URL}/energy_record_detail/{record_id}", json=update_record_data
         )
         response.raise_for_status()
+        clear_cached_data()
         st.success(f"Record ID {record_id} updated successfully.")
         # st.json(response.json())
     except requests.exceptions.HTTPError as e:
@@ -72,6 +149,7 @@ def delete_record(record_id):
         # Corrected the URL to match the API's expected endpoint
         response = requests.delete(f"{API_URL}/energy_record_detail/{record_id}")
         response.raise_for_status()
+        clear_cached_data()
         st.success(f"Record ID {record_id} deleted successfully.")
     except requests.exceptions.HTTPError as e:
         st.error(f"Failed to delete record: {e.response.content}")
@@ -83,11 +161,12 @@ def visualize_energy_contribution():
     # Visualize the contribution of different energy uses to the total
     # (space heating, space cooling, water heating, and cooking)
 
-    df = get_energy_records()
+    df = get_aggregated_records(["use_type"])
     if not df.empty:
         fig = px.pie(
             df,
             names="energy_use_types",
+            values="energy_consumption",
             title="The total energy consumption of space heating, space cooling, water heating, and cooking",
             labels={"energy_use_types": "Energy Use Types"},
             hover_data={"energy_use_types": "%{percent}, Terajoule"},
@@ -111,7 +190,7 @@ def visualize_energy_contribution():
 
 def visualize_energy_by_country_and_type():
     # Visualize energy consumption by country for each energy use type
-    df = get_energy_records()
+    df = get_aggregated_records(["country", "use_type"])
 
     if not df.empty:
         fig = px.bar(
@@ -137,7 +216,9 @@ def visualize_energy_by_country_and_type():
 def visualize_energy_uses_by_country():
     # Visualize Total Energy Consumption by country for all energy use types, energy types, and years (2012 to 2021)
 
-    df = get_energy_records()
+    df = get_aggregated_records(["country"])
+    if df.empty:
+        return
 
     df = df.sort_values(by="energy_consumption")
 
@@ -162,7 +243,7 @@ def visualize_energy_uses_by_country():
 
 def visualize_energy_consumption_each_year():
     # Visualize different countries' energy consumption each year
-    df = get_energy_records()
+    df = get_aggregated_records(["country", "year"])
 
     if not df.empty:
         # Allow user to select a year
@@ -196,7 +277,7 @@ def visualize_energy_consumption_each_year():
 def visualize_energy_consumption_over_time():
     # Visualize Energy Consumption Over the Years (2012 to 2021) by Country
 
-    df = get_energy_records()
+    df = get_aggregated_records(["country", "year"])
 
     if not df.empty:
         fig = px.scatter(
@@ -320,7 +401,31 @@ def main():
                     )
                     new_unit = st.selectbox("Unit name", df["units"].unique())
                     new_year = st.text_input("Year", value="2023")
-                    new_consumption = st.text_input("Energy consumption")
+                    new_households = st.number_input(
+                        "Number of households (1 000)", min_value=0.0, value=1000.0
+                    )
+
+                    # Prefill the consumption with the imputation model's estimate
+                    if st.button("Estimate consumption"):
+                        try:
+                            estimate = predict_consumption(
+                                {
+                                    "countries": new_country,
+                                    "energy_use_types": new_energy_use,
+                                    "number_of_households": new_households,
+                                    "year": int(new_year),
+                                }
+                            )
+                            if estimate is not None:
+                                st.session_state["new_consumption"] = f"{estimate:.3f}"
+                        except ValueError:
+                            st.error(
+                                "Invalid input for Year. Please enter a valid number."
+                            )
+
+                    new_consumption = st.text_input(
+                        "Energy consumption", key="new_consumption"
+                    )
 
                     if st.button("Add Record"):
                         try:
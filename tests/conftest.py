@@ -0,0 +1,99 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import event, insert
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import config  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.models import (  # noqa: E402
+    Countries,
+    EnergyRecord,
+    EnergyType,
+    EnergyUseType,
+    Units,
+)
+from app.rollups import rebuild_rollups  # noqa: E402
+
+COUNTRIES = ["Austria", "Belgium", "Croatia", "Denmark"]
+USE_TYPES = ["h_cooking", "h_space_heating", "h_water_heating"]
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """App on an empty SQLite database in ``tmp_path``, without response cache."""
+    uri = f"sqlite:///{tmp_path / 'energy_api.db'}"
+    monkeypatch.setattr(config.Config, "SQLALCHEMY_DATABASE_URI", uri)
+    monkeypatch.setattr(
+        config.Config, "SQLALCHEMY_BINDS", {"reader": config.read_database_uri(uri)}
+    )
+    monkeypatch.setattr(config.Config, "RESPONSE_CACHE_MAX_ENTRIES", 0)
+
+    app = create_app()
+    app.config["RESPONSE_CACHE_GENERATION_FILE"] = str(tmp_path / "generation")
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def add_records(app, count, first_year=2000):
+    """Insert ``count`` records spread over the test dimensions.
+
+    The dimension rows are created on the first call. Records get
+    consecutive years per (country, use type) starting at ``first_year``,
+    and the rollup tables are rebuilt afterwards.
+    """
+    with app.app_context():
+        if not db.session.query(Countries).count():
+            db.session.execute(
+                insert(Countries), [{"name": name} for name in COUNTRIES]
+            )
+            db.session.execute(insert(EnergyType), [{"code": "TOTAL"}])
+            db.session.execute(
+                insert(EnergyUseType), [{"type": name} for name in USE_TYPES]
+            )
+            db.session.execute(insert(Units), [{"name": "TJ"}])
+
+        groups = len(COUNTRIES) * len(USE_TYPES)
+        rows = [
+            {
+                "countries_id": index % len(COUNTRIES) + 1,
+                "energy_types_id": 1,
+                "energy_use_types_id": index // len(COUNTRIES) % len(USE_TYPES) + 1,
+                "units_id": 1,
+                "year": first_year + index // groups,
+                "energy_consumption": float(index),
+            }
+            for index in range(count)
+        ]
+        db.session.execute(insert(EnergyRecord), rows)
+        db.session.commit()
+        rebuild_rollups()
+
+
+@pytest.fixture
+def statements(app):
+    """List collecting the SQL statements run on every engine of ``app``."""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", record)
+    yield executed
+    for engine in engines:
+        event.remove(engine, "before_cursor_execute", record)
@@ -0,0 +1,60 @@
+import pytest
+
+from conftest import add_records
+
+BATCH_URL = "/api/energy_records/batch"
+
+
+@pytest.mark.parametrize(
+    "items, messages",
+    [
+        ([{"id": True, "energy_consumption": 1.0}], {"id": ["id must be an integer"]}),
+        ([{"id": "1", "energy_consumption": 1.0}], {"id": ["id must be an integer"]}),
+        ([{"id": 1}], {"_schema": ["No fields to update"]}),
+    ],
+)
+def test_put_rejects_invalid_items(app, client, items, messages):
+    add_records(app, 4)
+
+    response = client.put(BATCH_URL, json=items)
+
+    assert response.status_code == 400
+    assert response.get_json()["messages"] == {"0": messages}
+
+
+def test_put_rejects_duplicate_ids(app, client):
+    add_records(app, 4)
+    items = [
+        {"id": 1, "energy_consumption": 1.0},
+        {"id": 2, "energy_consumption": 2.0},
+        {"id": 1, "energy_consumption": 3.0},
+    ]
+
+    response = client.put(BATCH_URL, json=items)
+
+    assert response.status_code == 400
+    assert response.get_json()["messages"] == {"2": {"id": ["Duplicate id in batch"]}}
+
+
+def test_put_updates_records(app, client):
+    add_records(app, 4)
+    items = [
+        {"id": 1, "energy_consumption": 10.0},
+        {"id": 2, "energy_consumption": 20.0},
+    ]
+
+    response = client.put(BATCH_URL, json=items)
+
+    assert response.status_code == 200, response.get_data(as_text=True)
+    for item in items:
+        record = client.get(f"/api/energy_record_detail/{item['id']}").get_json()
+        assert record["energy_consumption"] == item["energy_consumption"]
+
+
+def test_delete_rejects_bool_ids(app, client):
+    add_records(app, 4)
+
+    response = client.delete(BATCH_URL, json={"ids": [True]})
+
+    assert response.status_code == 400
+    assert response.get_json()["messages"] == {"0": {"id": ["id must be an integer"]}}
@@ -0,0 +1,45 @@
+import uuid
+
+from sqlalchemy import delete, insert
+
+from app import db
+from app.dimension_cache import dimension_cache, invalidate_dimensions
+from app.models import Countries
+from conftest import COUNTRIES, add_records
+
+
+def rewrite_countries(names):
+    # Recreate the countries table with new ids, as init-db and a reload would
+    db.session.execute(delete(Countries))
+    db.session.execute(insert(Countries), [{"name": name} for name in names])
+    db.session.commit()
+
+
+def current_id(name):
+    return db.session.query(Countries.id).filter_by(name=name).scalar()
+
+
+def test_write_signalled_by_another_process_drops_the_maps(app):
+    add_records(app, 4)
+    with app.app_context():
+        cached = dimension_cache().id("countries", "Austria")
+        rewrite_countries(reversed(COUNTRIES))
+        assert dimension_cache().id("countries", "Austria") == cached
+
+        # Another process writes a new generation token after its rewrite
+        with open(app.config["RESPONSE_CACHE_GENERATION_FILE"], "w") as f:
+            f.write(uuid.uuid4().hex)
+
+        assert dimension_cache().id("countries", "Austria") == current_id("Austria")
+        assert current_id("Austria") != cached
+
+
+def test_invalidate_dimensions_drops_the_maps(app):
+    add_records(app, 4)
+    with app.app_context():
+        dimension_cache().id("countries", "Austria")
+        rewrite_countries(reversed(COUNTRIES))
+
+        invalidate_dimensions()
+
+        assert dimension_cache().id("countries", "Austria") == current_id("Austria")
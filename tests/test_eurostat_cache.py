@@ -0,0 +1,94 @@
+import eurostat
+import pandas as pd
+import pytest
+import requests
+
+from app import eurostat_cache
+
+DATASET = pd.DataFrame({"geo\\TIME_PERIOD": ["AT", "BE"], "2020": [1.0, 2.0]})
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """Local stub of the eurostat package, recording the downloads.
+
+    ``stub.failures`` is a list of exceptions raised by the next downloads.
+    """
+
+    class Stub:
+        calls = []
+        failures = []
+        timeouts = []
+
+    def get_data_df(code):
+        Stub.calls.append(code)
+        Stub.timeouts.append(eurostat.get_requests_args()["timeout"])
+        if Stub.failures:
+            raise Stub.failures.pop(0)
+        return DATASET.copy()
+
+    def get_toc_df(agency, dataset):
+        return pd.DataFrame({"last update of data": ["2024-01-01"]})
+
+    monkeypatch.setattr(eurostat, "get_data_df", get_data_df)
+    monkeypatch.setattr(eurostat, "get_toc_df", get_toc_df)
+    monkeypatch.setattr(eurostat_cache.time, "sleep", lambda seconds: None)
+    return Stub
+
+
+def test_cached_copy_is_reused(stub, tmp_path):
+    first = eurostat_cache.get_data_df("nrg_d_hhq", cache_dir=tmp_path)
+    second = eurostat_cache.get_data_df("nrg_d_hhq", cache_dir=tmp_path)
+
+    assert stub.calls == ["nrg_d_hhq"]
+    pd.testing.assert_frame_equal(first, DATASET)
+    pd.testing.assert_frame_equal(second, DATASET)
+    assert eurostat_cache.read_metadata("nrg_d_hhq", tmp_path)["version"] == (
+        "2024-01-01"
+    )
+
+
+def test_network_errors_are_retried(stub, tmp_path):
+    stub.failures = [requests.Timeout(), ConnectionError()]
+
+    df = eurostat_cache.get_data_df("nrg_d_hhq", cache_dir=tmp_path, retries=3)
+
+    assert stub.calls == ["nrg_d_hhq"] * 3
+    pd.testing.assert_frame_equal(df, DATASET)
+
+
+def test_other_errors_are_not_retried(stub, tmp_path):
+    stub.failures = [ValueError("Dataset not found")]
+
+    with pytest.raises(ValueError):
+        eurostat_cache.get_data_df("unknown", cache_dir=tmp_path, retries=3)
+    assert stub.calls == ["unknown"]
+
+
+def test_last_attempt_error_is_raised(stub, tmp_path):
+    stub.failures = [requests.Timeout(), requests.Timeout()]
+
+    with pytest.raises(requests.Timeout):
+        eurostat_cache.get_data_df("nrg_d_hhq", cache_dir=tmp_path, retries=2)
+    assert stub.calls == ["nrg_d_hhq"] * 2
+    assert not eurostat_cache.cache_paths("nrg_d_hhq", tmp_path)[0].exists()
+
+
+def test_timeout_is_set_for_the_download(stub, tmp_path):
+    before = eurostat.get_requests_args()["timeout"]
+
+    eurostat_cache.get_data_df("nrg_d_hhq", cache_dir=tmp_path, timeout=7.5)
+
+    assert stub.timeouts == [7.5]
+    assert eurostat.get_requests_args()["timeout"] == before
+
+
+def test_offline_reads_only_the_cache(stub, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        eurostat_cache.get_data_df("nrg_d_hhq", offline=True, cache_dir=tmp_path)
+
+    eurostat_cache.get_data_df("nrg_d_hhq", cache_dir=tmp_path)
+    df = eurostat_cache.get_data_df("nrg_d_hhq", offline=True, cache_dir=tmp_path)
+
+    assert stub.calls == ["nrg_d_hhq"]
+    pd.testing.assert_frame_equal(df, DATASET)
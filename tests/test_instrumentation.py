@@ -0,0 +1,52 @@
+import tracemalloc
+
+import pytest
+
+from app import instrumentation
+from app.instrumentation import stage
+
+BUFFER_MB = 16
+
+
+@pytest.fixture
+def traced_run():
+    """A run of stages recording their peak memory."""
+    was_tracing = tracemalloc.is_tracing()
+    instrumentation.reset(trace_memory=True)
+    yield instrumentation.STAGES
+    instrumentation.reset()
+    if not was_tracing:
+        tracemalloc.stop()
+
+
+def allocate():
+    buffer = bytearray(BUFFER_MB * 1024**2)
+    del buffer
+
+
+def test_leaf_stage_records_its_peak(traced_run):
+    with stage("leaf") as record:
+        allocate()
+
+    assert record["peak_memory_mb"] >= BUFFER_MB
+
+
+def test_parent_stage_includes_nested_peaks(traced_run):
+    with stage("parent") as parent:
+        with stage("first") as first:
+            allocate()
+        with stage("second") as second:
+            pass
+
+    assert first["peak_memory_mb"] >= BUFFER_MB
+    assert second["peak_memory_mb"] < BUFFER_MB
+    assert parent["peak_memory_mb"] >= BUFFER_MB
+
+
+def test_memory_is_not_traced_by_default():
+    instrumentation.reset()
+
+    with stage("leaf") as record:
+        allocate()
+
+    assert record["peak_memory_mb"] is None
@@ -0,0 +1,38 @@
+import pytest
+
+from app.query_plans import api_queries, explain, plan_problems
+
+
+def test_plan_problems_flags_scans():
+    assert plan_problems(["SCAN energy_records"])
+    assert plan_problems(["SCAN TABLE energy_records"])
+    assert plan_problems(["SCAN countries USING INDEX ix_countries_name"])
+    assert not plan_problems(
+        [
+            "SCAN countries USING COVERING INDEX sqlite_autoindex_countries_1",
+            "SCAN TABLE countries USING COVERING INDEX sqlite_autoindex_countries_1",
+            "SCAN rollup_country_use_type",
+            "SEARCH energy_records USING INTEGER PRIMARY KEY (rowid=?)",
+            "USE TEMP B-TREE FOR GROUP BY",
+        ]
+    )
+
+
+@pytest.fixture
+def plans(app):
+    # EXPLAIN QUERY PLAN of every API query, on the schema of the models
+    with app.app_context():
+        return {name: explain(stmt) for name, stmt in api_queries().items()}
+
+
+def test_api_queries_use_indexes(plans):
+    problems = {
+        name: plan_problems(plan) for name, plan in plans.items() if plan_problems(plan)
+    }
+    assert not problems, "\n".join(f"{name}: {plans[name]}" for name in problems)
+
+
+@pytest.mark.parametrize("name", ["page by id", "page by country and year"])
+def test_keyset_pages_are_read_in_index_order(plans, name):
+    # A page sorting the rows after its cursor would read the rest of the table
+    assert not [line for line in plans[name] if "USE TEMP B-TREE" in line]
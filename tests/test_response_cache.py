@@ -0,0 +1,53 @@
+import threading
+
+import pytest
+
+from app.response_cache import LRUCache, cached_response, invalidate_responses
+
+
+@pytest.fixture
+def counted_view(app):
+    """GET /counted, cached, answering how many times the view ran.
+
+    ``during_view`` is called while the view runs, before it answers.
+    """
+    app.extensions["response_cache"] = LRUCache(max_entries=16, ttl=300)
+    state = {"calls": 0, "during_view": None}
+
+    @cached_response
+    def counted():
+        state["calls"] += 1
+        if state["during_view"] is not None:
+            state["during_view"]()
+        return {"calls": state["calls"]}
+
+    app.add_url_rule("/counted", "counted", counted)
+    return state
+
+
+def test_response_is_cached(app, counted_view):
+    client = app.test_client()
+
+    assert client.get("/counted").get_json() == {"calls": 1}
+    assert client.get("/counted").get_json() == {"calls": 1}
+
+
+def test_write_during_the_view_is_not_cached_over(app, counted_view):
+    client = app.test_client()
+
+    def write_in_another_thread():
+        # A write request handled by another thread of the same process
+        def write():
+            with app.test_request_context("/api/energy_records/", method="POST"):
+                invalidate_responses()
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        thread.join()
+
+    counted_view["during_view"] = write_in_another_thread
+    assert client.get("/counted").get_json() == {"calls": 1}
+
+    counted_view["during_view"] = None
+    assert client.get("/counted").get_json() == {"calls": 2}
+    assert client.get("/counted").get_json() == {"calls": 2}
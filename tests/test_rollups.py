@@ -0,0 +1,100 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+from sqlalchemy import select
+
+from app import db
+from app.rollups import ROLLUPS, rebuild_rollups
+from conftest import ROOT, add_records
+
+# The pipeline modules import their siblings the way populate_db.py does
+# when it is run from the app directory
+sys.path.insert(0, os.path.join(ROOT, "app"))
+from populate_db import load_data  # noqa: E402
+
+BATCH_URL = "/api/energy_records/batch"
+
+
+def record(country, use_type, year, consumption):
+    return {
+        "countries": country,
+        "energy_types": "TOTAL",
+        "energy_use_types": use_type,
+        "units": "TJ",
+        "year": year,
+        "energy_consumption": consumption,
+    }
+
+
+def rollup_rows():
+    # Every row of every rollup table, by table name and key
+    rows = {}
+    for model, _ in ROLLUPS:
+        for row in db.session.execute(select(model.__table__)).mappings():
+            key = tuple(row[column.name] for column in model.__table__.primary_key)
+            rows[(model.__tablename__, key)] = (
+                pytest.approx(row["energy_consumption_sum"]),
+                row["record_count"],
+            )
+    return rows
+
+
+def assert_rollups_match_rebuild(app):
+    with app.app_context():
+        maintained = rollup_rows()
+        rebuild_rollups()
+        assert maintained == rollup_rows()
+
+
+def test_api_writes_maintain_the_rollups(app, client):
+    add_records(app, 24)
+
+    responses = [
+        client.post(
+            "/api/energy_records/", json=record("Austria", "h_cooking", 2010, 5.0)
+        ),
+        client.put(
+            "/api/energy_record_detail/1",
+            json={"countries": "Belgium", "year": 2011, "energy_consumption": 7.5},
+        ),
+        client.delete("/api/energy_record_detail/2"),
+        client.post(
+            BATCH_URL,
+            json=[
+                record("Croatia", "h_cooking", 2012, 1.0),
+                record("Denmark", "h_water_heating", 2012, 2.0),
+            ],
+        ),
+        client.put(
+            BATCH_URL,
+            json=[
+                {"id": 3, "energy_consumption": 1.5},
+                {"id": 4, "energy_use_types": "h_space_heating", "year": 2013},
+            ],
+        ),
+        client.delete(BATCH_URL, json={"ids": [5, 6]}),
+    ]
+
+    for response in responses:
+        assert response.status_code in (200, 201), response.get_data(as_text=True)
+    assert_rollups_match_rebuild(app)
+
+
+def test_incremental_load_maintains_the_rollups(app):
+    add_records(app, 24)
+    data_df = pd.DataFrame(
+        [
+            # Existing record 7 with a new consumption, record 8 unchanged
+            record("Croatia", "h_space_heating", 2000, 60.0),
+            record("Denmark", "h_space_heating", 2000, 7.0),
+            # New records, one of them in a new country
+            record("Austria", "h_water_heating", 2020, 3.0),
+            record("Estonia", "h_cooking", 2020, 4.0),
+        ]
+    )
+
+    with app.app_context():
+        load_data(db.session, data_df, incremental=True)
+    assert_rollups_match_rebuild(app)
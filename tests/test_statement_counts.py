@@ -0,0 +1,37 @@
+import pytest
+
+from conftest import add_records
+
+# Read requests whose number of SQL statements must not depend on the number
+# of records (no per-row queries or lazy loads)
+REQUESTS = [
+    "/api/energy_records/",
+    "/api/energy_records/?limit=50",
+    "/api/energy_records/?limit=50&order=country_year",
+    "/api/energy_record_detail/1",
+    "/api/energy_records/aggregate?group_by=country,year&agg=sum",
+    "/api/energy_records/aggregate?group_by=use_type&agg=mean&country=Austria",
+    "/api/energy_records/aggregate?group_by=year&agg=max",
+    "/api/energy_records/aggregate?group_by=country&energy_type=TOTAL",
+]
+
+
+def count_statements(client, statements, url):
+    del statements[:]
+    response = client.get(url)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return len(statements)
+
+
+@pytest.mark.parametrize("url", REQUESTS)
+def test_statement_count_independent_of_row_count(app, client, statements, url):
+    add_records(app, 24)
+    # Warm up the connection pools and any per-process lookups
+    client.get(url)
+    small = count_statements(client, statements, url)
+
+    add_records(app, 2400, first_year=2100)
+    large = count_statements(client, statements, url)
+
+    assert small == large
+    assert small >= 1
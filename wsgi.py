@@ -0,0 +1,5 @@
+# WSGI entry point for production servers, e.g.
+#   gunicorn --workers 4 --bind 127.0.0.1:5000 wsgi:app
+from app import create_app
+
+app = create_app()